@@ -10,12 +10,23 @@ CREATE TABLE candidates (
     work_authorization TEXT,
     total_years_experience NUMERIC,
     skills TEXT[],
+    skill_ids INTEGER[],
     raw_text TEXT,
     embedding VECTOR(768),
     structured_data JSONB,
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', COALESCE(raw_text, ''))) STORED,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Create scoring weight profiles (feature -> weight, see services/common/scoring.py)
+CREATE TABLE scoring_profiles (
+    name TEXT PRIMARY KEY,
+    weights JSONB NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+INSERT INTO scoring_profiles (name, weights) VALUES
+    ('default', '{"similarity": 0.40, "skill_overlap": 0.35, "experience": 0.25}');
+
 -- Create job_descriptions table
 CREATE TABLE job_descriptions (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -23,11 +34,124 @@ CREATE TABLE job_descriptions (
     location TEXT,
     required_skills TEXT[],
     optional_skills TEXT[],
+    required_skill_ids INTEGER[],
+    optional_skill_ids INTEGER[],
     min_years_experience NUMERIC,
     raw_text TEXT,
     embedding VECTOR(768),
-    created_at TIMESTAMPTZ DEFAULT NOW()
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(raw_text, '')), 'B')
+    ) STORED,
+    is_active BOOLEAN DEFAULT TRUE,
+    scoring_profile TEXT NOT NULL DEFAULT 'default' REFERENCES scoring_profiles(name) ON UPDATE CASCADE,
+    matches_refreshed_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Bump updated_at when descriptive fields change (agent goal strategies and
+-- candidate_matches are keyed on it). The embeddings service sets it explicitly
+-- when it stores a new embedding, so unrelated column updates never invalidate.
+CREATE FUNCTION touch_job_description() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER job_descriptions_touch
+    BEFORE UPDATE ON job_descriptions
+    FOR EACH ROW
+    WHEN ((OLD.title, OLD.location, OLD.required_skills, OLD.optional_skills, OLD.min_years_experience, OLD.raw_text,
+           OLD.scoring_profile)
+          IS DISTINCT FROM
+          (NEW.title, NEW.location, NEW.required_skills, NEW.optional_skills, NEW.min_years_experience, NEW.raw_text,
+           NEW.scoring_profile))
+    EXECUTE FUNCTION touch_job_description();
+
+-- Create precomputed top-N candidate matches per active job description.
+-- Valid while job_descriptions.matches_refreshed_at >= updated_at.
+CREATE TABLE candidate_matches (
+    jd_id UUID REFERENCES job_descriptions(id) ON DELETE CASCADE,
+    candidate_id UUID REFERENCES candidates(id) ON DELETE CASCADE,
+    similarity_score DOUBLE PRECISION,
+    skill_overlap_score DOUBLE PRECISION,
+    experience_score DOUBLE PRECISION,
+    final_score DOUBLE PRECISION NOT NULL,
+    explanation JSONB,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (jd_id, candidate_id)
+);
+
+-- Create section-aware resume chunks, each with its own embedding.
+-- At most MAX_CHUNKS_PER_CANDIDATE rows per candidate (see embeddings/chunking.py).
+CREATE TABLE candidate_chunks (
+    candidate_id UUID REFERENCES candidates(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    content TEXT NOT NULL,
+    embedding VECTOR(768) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (candidate_id, chunk_index)
+);
+
+-- Create data version for cached rankings (services/api/ranking_cache.py).
+-- Bumped by every statement that can change a ranking, in the same
+-- transaction, so a version is never visible before the data it covers
+-- (a sequence would be). The version is the sum over the slots; each
+-- session bumps the slot of its backend pid, so concurrent writers rarely
+-- wait on each other's row lock.
+CREATE TABLE ranking_data_version (
+    slot INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
 );
+INSERT INTO ranking_data_version (slot) SELECT generate_series(0, 63);
+
+CREATE FUNCTION bump_ranking_data_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE ranking_data_version SET version = version + 1 WHERE slot = pg_backend_pid() % 64;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER candidates_ranking_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON candidates
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_ranking_data_version();
+
+CREATE TRIGGER candidate_chunks_ranking_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON candidate_chunks
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_ranking_data_version();
+
+-- matches_refreshed_at is left out: refreshing matches does not change rankings
+CREATE TRIGGER job_descriptions_ranking_version
+    AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF title, location, required_skills, optional_skills,
+        required_skill_ids, optional_skill_ids, min_years_experience, raw_text, embedding, is_active,
+        scoring_profile
+    ON job_descriptions
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_ranking_data_version();
+
+CREATE TRIGGER scoring_profiles_ranking_version
+    AFTER INSERT OR UPDATE OR DELETE ON scoring_profiles
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_ranking_data_version();
+
+-- New weights make the stored matches of every JD using the profile stale
+CREATE FUNCTION touch_profile_job_descriptions() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE job_descriptions SET updated_at = NOW() WHERE scoring_profile = NEW.name;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER scoring_profiles_touch
+    AFTER UPDATE OF weights ON scoring_profiles
+    FOR EACH ROW
+    WHEN (OLD.weights IS DISTINCT FROM NEW.weights)
+    EXECUTE FUNCTION touch_profile_job_descriptions();
 
 -- Create agent goals table
 CREATE TABLE agent_goals (
@@ -38,6 +162,8 @@ CREATE TABLE agent_goals (
     deadline TIMESTAMPTZ,
     priority TEXT DEFAULT 'medium',
     status TEXT DEFAULT 'active',
+    strategy JSONB,
+    strategy_fingerprint TEXT,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
@@ -51,33 +177,148 @@ CREATE TABLE agent_actions (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Create agent task queue (claimed with FOR UPDATE SKIP LOCKED by agent workers)
+CREATE TABLE agent_tasks (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    task_type TEXT NOT NULL,
+    goal_id UUID REFERENCES agent_goals(id) ON DELETE CASCADE,
+    payload JSONB DEFAULT '{}',
+    checkpoint JSONB DEFAULT '{}',
+    status TEXT DEFAULT 'pending',
+    attempts INTEGER DEFAULT 0,
+    max_attempts INTEGER DEFAULT 5,
+    run_after TIMESTAMPTZ DEFAULT NOW(),
+    locked_by TEXT,
+    locked_until TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    completed_at TIMESTAMPTZ
+);
+
+-- Create scheduled agent actions (follow-ups etc.), executed at run_at by the agent scheduler
+CREATE TABLE agent_scheduled_actions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    goal_id UUID REFERENCES agent_goals(id) ON DELETE CASCADE,
+    action_type TEXT NOT NULL,
+    payload JSONB DEFAULT '{}',
+    dedupe_key TEXT UNIQUE,
+    run_at TIMESTAMPTZ NOT NULL,
+    status TEXT DEFAULT 'pending',
+    attempts INTEGER DEFAULT 0,
+    max_attempts INTEGER DEFAULT 5,
+    locked_by TEXT,
+    locked_until TIMESTAMPTZ,
+    result JSONB,
+    last_error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    completed_at TIMESTAMPTZ
+);
+
 -- Create candidate feedback table
 CREATE TABLE candidate_feedback (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     candidate_id UUID REFERENCES candidates(id),
+    jd_id UUID REFERENCES job_descriptions(id) ON DELETE SET NULL,
     feedback_type TEXT NOT NULL,
     feedback_score NUMERIC,
     notes TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    -- Arrival order, assigned by the server; created_at is the time reported by the client
+    seq BIGSERIAL UNIQUE
+);
+
+-- Create versioned ranking models trained from candidate_feedback
+-- (see services/common/learning.py); at most one is active.
+CREATE TABLE ranking_models (
+    version BIGSERIAL PRIMARY KEY,
+    model_type TEXT NOT NULL,
+    parameters JSONB NOT NULL,
+    metrics JSONB,
+    is_active BOOLEAN NOT NULL DEFAULT FALSE,
+    trained_at TIMESTAMPTZ DEFAULT NOW(),
+    activated_at TIMESTAMPTZ
+);
+
+-- Last feedback (candidate_feedback.seq) seen by the last training run,
+-- trained or skipped; the agent retrains once RETRAIN_AFTER_FEEDBACK rows
+-- arrive after it
+CREATE TABLE ranking_model_training (
+    feedback_watermark BIGINT NOT NULL DEFAULT 0,
+    last_run_at TIMESTAMPTZ,
+    last_result JSONB
+);
+INSERT INTO ranking_model_training DEFAULT VALUES;
+
+-- Create bulk ingestion job tables
+CREATE TABLE ingestion_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    status TEXT DEFAULT 'pending',
+    total_files INTEGER DEFAULT 0,
+    processed_files INTEGER DEFAULT 0,
+    failed_files INTEGER DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    completed_at TIMESTAMPTZ
+);
+
+CREATE TABLE ingestion_job_files (
+    job_id UUID REFERENCES ingestion_jobs(id) ON DELETE CASCADE,
+    file_index INTEGER NOT NULL,
+    file_name TEXT,
+    status TEXT DEFAULT 'pending',
+    candidate_id UUID,
+    error TEXT,
+    PRIMARY KEY (job_id, file_index)
+);
+
+-- Create embedding cache table (content-addressed by model + normalized text)
+CREATE TABLE embedding_cache (
+    content_hash TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    embedding VECTOR(768) NOT NULL,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
 -- Create indexes for performance
-CREATE INDEX ON candidates USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+-- HNSW needs no training data, so unlike IVFFlat it can be built on empty tables.
+-- Rebuild with: python -m common.maintenance rebuild-indexes
+-- With EMBEDDING_STORAGE=halfvec|binary the candidate and chunk indexes are
+-- rebuilt over quantized expressions instead (see common/vector_search.py).
+CREATE INDEX candidates_embedding_hnsw_idx ON candidates USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 CREATE INDEX ON candidates USING GIN (skills);
-CREATE INDEX ON job_descriptions USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+CREATE INDEX ON candidates USING GIN (skill_ids);
+CREATE INDEX ON candidates USING GIN (search_vector);
+CREATE INDEX ON candidates (created_at DESC, id DESC);
+CREATE INDEX job_descriptions_embedding_hnsw_idx ON job_descriptions USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 CREATE INDEX ON job_descriptions USING GIN (required_skills);
+CREATE INDEX ON job_descriptions (updated_at);
+CREATE INDEX ON job_descriptions USING GIN (search_vector);
+CREATE INDEX ON job_descriptions (created_at DESC, id DESC);
+CREATE INDEX ON candidate_matches (jd_id, final_score DESC);
+CREATE INDEX ON candidate_matches (candidate_id);
+CREATE INDEX candidate_chunks_embedding_hnsw_idx ON candidate_chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 CREATE INDEX ON agent_actions (goal_id);
 CREATE INDEX ON agent_actions (action_type);
 CREATE INDEX ON agent_actions (created_at);
+CREATE INDEX agent_tasks_claim_idx ON agent_tasks (run_after) WHERE status IN ('pending', 'running');
+CREATE INDEX ON agent_tasks (goal_id);
+CREATE INDEX agent_scheduled_actions_due_idx ON agent_scheduled_actions (run_at) WHERE status = 'pending';
+CREATE INDEX agent_scheduled_actions_lease_idx ON agent_scheduled_actions (locked_until) WHERE status = 'running';
+CREATE INDEX ON agent_scheduled_actions (goal_id);
 CREATE INDEX ON candidate_feedback (candidate_id);
 CREATE INDEX ON candidate_feedback (feedback_type);
+CREATE UNIQUE INDEX ranking_models_active_idx ON ranking_models ((TRUE)) WHERE is_active;
 
--- Insert sample job description
-INSERT INTO job_descriptions (title, location, required_skills, optional_skills, min_years_experience, raw_text) VALUES (
+-- Insert sample job description (skill IDs from services/common/skills.json)
+INSERT INTO job_descriptions (title, location, required_skills, optional_skills, required_skill_ids, optional_skill_ids, min_years_experience, raw_text) VALUES (
     'Senior Python Developer',
     'Remote',
-    ARRAY['Python', 'FastAPI', 'PostgreSQL', 'Docker'],
-    ARRAY['AWS', 'Redis', 'GraphQL', 'Machine Learning'],
+    ARRAY['python', 'fastapi', 'postgresql', 'docker'],
+    ARRAY['aws', 'redis', 'graphql', 'machine learning'],
+    ARRAY[1, 8, 7, 6],
+    ARRAY[5, 15, 17, 18],
     3,
     'We are looking for a Senior Python Developer to join our team. You will work on building scalable APIs using FastAPI and PostgreSQL. Experience with Docker and cloud platforms is preferred. This is a remote position with competitive compensation.'
 );
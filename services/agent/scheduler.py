@@ -0,0 +1,215 @@
+"""Scheduler for timed agent actions such as follow-ups.
+
+Actions live in ``agent_scheduled_actions``. Instead of polling the whole
+table, the scheduler claims only the actions due within a short lookahead
+window (served by a partial index on ``run_at`` over pending rows) and keeps
+them in an in-memory min-heap, sleeping until the earliest one is due.
+Claims are leased, so actions held by a scheduler that dies are handed back
+to the table and picked up by another replica. Execution concurrency is
+bounded by a semaphore.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "16"))
+SCHEDULER_LOOKAHEAD_SECONDS = float(os.getenv("SCHEDULER_LOOKAHEAD_SECONDS", "60"))
+SCHEDULER_MAX_BUFFERED = int(os.getenv("SCHEDULER_MAX_BUFFERED", "1000"))
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "300"))
+SCHEDULER_MAX_ATTEMPTS = int(os.getenv("SCHEDULER_MAX_ATTEMPTS", "5"))
+SCHEDULER_RETRY_BASE_SECONDS = float(os.getenv("SCHEDULER_RETRY_BASE_SECONDS", "60"))
+SCHEDULER_RETRY_MAX_SECONDS = float(os.getenv("SCHEDULER_RETRY_MAX_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+ActionHandler = Callable[[dict], Awaitable[Any]]
+
+
+class ActionScheduler:
+    """Executes ``agent_scheduled_actions`` rows at their ``run_at`` time"""
+
+    def __init__(self, db, worker_id: str, max_concurrency: int = SCHEDULER_MAX_CONCURRENCY):
+        self.db = db
+        self.worker_id = worker_id
+        self.max_concurrency = max(1, max_concurrency)
+        self.handlers: Dict[str, ActionHandler] = {}
+        self._heap: List[Tuple[float, int, dict]] = []
+        self._sequence = itertools.count()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._running: set = set()
+
+    def register(self, action_type: str, handler: ActionHandler):
+        self.handlers[action_type] = handler
+
+    async def schedule(
+        self,
+        action_type: str,
+        run_at: datetime,
+        goal_id: Optional[str] = None,
+        payload: Optional[dict] = None,
+        dedupe_key: Optional[str] = None,
+    ) -> Optional[str]:
+        """Persist an action to run at ``run_at``.
+
+        Actions sharing a ``dedupe_key`` are only scheduled once; returns the
+        new action id, or None when a duplicate already exists.
+        """
+        row = await self.db.fetchone("""
+            INSERT INTO agent_scheduled_actions (goal_id, action_type, payload, dedupe_key, run_at, max_attempts)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (dedupe_key) DO NOTHING
+            RETURNING id
+        """, (goal_id, action_type, json.dumps(payload or {}), dedupe_key, run_at, SCHEDULER_MAX_ATTEMPTS))
+
+        if row and run_at.timestamp() <= time.time() + SCHEDULER_LOOKAHEAD_SECONDS:
+            self._wakeup.set()
+        return str(row["id"]) if row else None
+
+    def start(self):
+        self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+
+        # Hand buffered claims back so another scheduler can run them on time
+        buffered = [str(action["id"]) for _, _, action in self._heap]
+        self._heap = []
+        if buffered:
+            await self._release(buffered)
+
+    async def claim_due(self, limit: int) -> List[dict]:
+        """Claim pending actions due within the lookahead window"""
+        return await self.db.fetchall("""
+            UPDATE agent_scheduled_actions a
+            SET status = 'running',
+                attempts = a.attempts + 1,
+                locked_by = %s,
+                locked_until = GREATEST(a.run_at, NOW()) + make_interval(secs => %s)
+            FROM (
+                SELECT id FROM agent_scheduled_actions
+                WHERE status = 'pending' AND run_at <= NOW() + make_interval(secs => %s)
+                ORDER BY run_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ) due
+            WHERE a.id = due.id
+            RETURNING a.id, a.goal_id, a.action_type, a.payload, a.run_at, a.attempts, a.max_attempts
+        """, (self.worker_id, SCHEDULER_LEASE_SECONDS, SCHEDULER_LOOKAHEAD_SECONDS, limit))
+
+    async def recover_expired(self) -> int:
+        """Return actions whose lease expired (their scheduler died) to pending"""
+        return await self.db.execute("""
+            UPDATE agent_scheduled_actions
+            SET status = 'pending', locked_by = NULL, locked_until = NULL
+            WHERE status = 'running' AND locked_until < NOW()
+        """)
+
+    async def _release(self, action_ids: List[str]):
+        await self.db.execute("""
+            UPDATE agent_scheduled_actions
+            SET status = 'pending', attempts = GREATEST(attempts - 1, 0),
+                locked_by = NULL, locked_until = NULL
+            WHERE id = ANY(%s::uuid[]) AND locked_by = %s
+        """, (action_ids, self.worker_id))
+
+    async def _refill(self):
+        recovered = await self.recover_expired()
+        if recovered:
+            logger.info(f"Recovered {recovered} scheduled actions with expired leases")
+
+        room = SCHEDULER_MAX_BUFFERED - len(self._heap)
+        if room <= 0:
+            return
+        for action in await self.claim_due(room):
+            heapq.heappush(self._heap, (action["run_at"].timestamp(), next(self._sequence), action))
+
+    async def _run(self):
+        next_refill = 0.0
+        while True:
+            now = time.time()
+            if now >= next_refill or self._wakeup.is_set():
+                self._wakeup.clear()
+                try:
+                    await self._refill()
+                except Exception as e:
+                    logger.error(f"Error loading scheduled actions: {e}")
+                next_refill = now + SCHEDULER_LOOKAHEAD_SECONDS / 2
+
+            while self._heap and self._heap[0][0] <= time.time():
+                _, _, action = heapq.heappop(self._heap)
+                await self._semaphore.acquire()
+                task = asyncio.create_task(self._execute(action))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            timeout = next_refill - time.time()
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0.0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, action: dict):
+        action_id = str(action["id"])
+        try:
+            handler = self.handlers.get(action["action_type"])
+            if handler is None:
+                raise ValueError(f"No handler for scheduled action {action['action_type']}")
+            result = await handler(action)
+            await self.db.execute("""
+                UPDATE agent_scheduled_actions
+                SET status = 'completed', result = %s, last_error = NULL,
+                    locked_by = NULL, locked_until = NULL, completed_at = NOW()
+                WHERE id = %s AND locked_by = %s
+            """, (json.dumps(result, default=str), action_id, self.worker_id))
+        except asyncio.CancelledError:
+            await asyncio.shield(self._release([action_id]))
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled action {action_id} ({action['action_type']}) failed: {e}")
+            try:
+                await self._fail(action, str(e))
+            except Exception as fail_error:
+                logger.error(f"Error recording failure of scheduled action {action_id}: {fail_error}")
+        finally:
+            self._semaphore.release()
+
+    async def _fail(self, action: dict, error: str):
+        """Reschedule with exponential backoff, or give up after max_attempts"""
+        attempts = action["attempts"]
+        if attempts >= action["max_attempts"]:
+            status, delay = "failed", 0.0
+        else:
+            status = "pending"
+            delay = min(SCHEDULER_RETRY_BASE_SECONDS * 2 ** (attempts - 1), SCHEDULER_RETRY_MAX_SECONDS)
+
+        await self.db.execute("""
+            UPDATE agent_scheduled_actions
+            SET status = %s, last_error = %s, locked_by = NULL, locked_until = NULL,
+                run_at = NOW() + make_interval(secs => %s),
+                completed_at = CASE WHEN %s = 'failed' THEN NOW() END
+            WHERE id = %s AND locked_by = %s
+        """, (status, error, delay, status, str(action["id"]), self.worker_id))
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._heap),
+            "running": len(self._running),
+            "max_concurrency": self.max_concurrency,
+        }
@@ -0,0 +1,260 @@
+"""Durable Postgres-backed task queue for agent work.
+
+Tasks live in ``agent_tasks``. Workers claim them with
+``FOR UPDATE SKIP LOCKED`` so any number of workers, in any number of agent
+replicas, can share the queue without handing out a task twice. A claimed
+task holds a lease (``locked_until``), renewed every
+``AGENT_TASK_HEARTBEAT_SECONDS`` while its handler runs; if its worker
+dies, the lease expires and another worker picks the task up again,
+resuming from its last checkpoint. Failed tasks are retried with exponential backoff until
+``max_attempts`` is reached.
+"""
+import asyncio
+import json
+import logging
+import os
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from psycopg2.extras import RealDictCursor
+
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "8"))
+AGENT_TASK_POLL_SECONDS = float(os.getenv("AGENT_TASK_POLL_SECONDS", "1"))
+AGENT_TASK_LEASE_SECONDS = int(os.getenv("AGENT_TASK_LEASE_SECONDS", "300"))
+AGENT_TASK_HEARTBEAT_SECONDS = float(os.getenv("AGENT_TASK_HEARTBEAT_SECONDS", str(AGENT_TASK_LEASE_SECONDS / 3)))
+AGENT_TASK_MAX_ATTEMPTS = int(os.getenv("AGENT_TASK_MAX_ATTEMPTS", "5"))
+AGENT_TASK_RETRY_BASE_SECONDS = float(os.getenv("AGENT_TASK_RETRY_BASE_SECONDS", "10"))
+AGENT_TASK_RETRY_MAX_SECONDS = float(os.getenv("AGENT_TASK_RETRY_MAX_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+
+def json_default(value: Any) -> Any:
+    """``json.dumps`` fallback for database values (UUIDs, timestamps, NUMERIC)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+class TaskContext:
+    """A claimed task and its checkpointed step results"""
+
+    def __init__(self, queue: "TaskQueue", task: dict):
+        self.queue = queue
+        self.task = task
+        self.id = str(task["id"])
+        self.goal_id = str(task["goal_id"]) if task.get("goal_id") else None
+        self.payload = task.get("payload") or {}
+        self.state: Dict[str, Any] = dict(task.get("checkpoint") or {})
+
+    async def step(self, name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` once; its JSON-serializable result is checkpointed under ``name``.
+
+        On a retry or after a restart, completed steps return their stored
+        result instead of running again.
+        """
+        if name in self.state:
+            return self.state[name]
+        result = await fn()
+        await self.save(name, result)
+        return self.state[name]
+
+    async def save(self, name: str, value: Any):
+        """Checkpoint ``value`` under ``name`` and extend the lease"""
+        self.state[name] = json.loads(json.dumps(value, default=json_default))
+        await self.queue.checkpoint(self.id, self.state)
+
+
+Handler = Callable[[TaskContext], Awaitable[None]]
+
+
+class TaskQueue:
+    """Pool of asyncio workers executing tasks from ``agent_tasks``"""
+
+    def __init__(self, db, worker_id: str, workers: int = AGENT_WORKERS):
+        self.db = db
+        self.worker_id = worker_id
+        self.workers = max(1, workers)
+        self.handlers: Dict[str, Handler] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, task_type: str, handler: Handler):
+        self.handlers[task_type] = handler
+
+    @staticmethod
+    def add(cursor, task_type: str, goal_id: Optional[str] = None, payload: Optional[dict] = None) -> str:
+        """Insert a task inside the caller's transaction and return its id"""
+        cursor.execute("""
+            INSERT INTO agent_tasks (task_type, goal_id, payload, max_attempts)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id
+        """, (task_type, goal_id, json.dumps(payload or {}), AGENT_TASK_MAX_ATTEMPTS))
+        row = cursor.fetchone()
+        return str(row["id"] if isinstance(row, dict) else row[0])
+
+    async def enqueue(self, task_type: str, goal_id: Optional[str] = None, payload: Optional[dict] = None) -> str:
+        def _add(conn):
+            with conn.cursor() as cursor:
+                return self.add(cursor, task_type, goal_id, payload)
+
+        task_id = await self.db.run(_add)
+        self.notify()
+        return task_id
+
+    def notify(self):
+        """Wake idle workers in this process instead of waiting for the next poll"""
+        self._wakeup.set()
+
+    def start(self):
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._worker(index)) for index in range(self.workers)
+        ]
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def claim(self) -> Optional[dict]:
+        """Claim the next runnable task, including ones whose lease has expired"""
+        def _claim(conn):
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    UPDATE agent_tasks t
+                    SET status = 'running',
+                        attempts = t.attempts + 1,
+                        locked_by = %s,
+                        locked_until = NOW() + make_interval(secs => %s),
+                        updated_at = NOW()
+                    FROM (
+                        SELECT id FROM agent_tasks
+                        WHERE status IN ('pending', 'running')
+                          AND run_after <= NOW()
+                          AND (status = 'pending' OR locked_until < NOW())
+                        ORDER BY run_after
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    ) next
+                    WHERE t.id = next.id
+                    RETURNING t.*
+                """, (self.worker_id, AGENT_TASK_LEASE_SECONDS))
+                return cursor.fetchone()
+
+        return await self.db.run(_claim)
+
+    async def checkpoint(self, task_id: str, state: dict):
+        await self.db.execute("""
+            UPDATE agent_tasks
+            SET checkpoint = %s,
+                locked_until = NOW() + make_interval(secs => %s),
+                updated_at = NOW()
+            WHERE id = %s AND locked_by = %s
+        """, (json.dumps(state), AGENT_TASK_LEASE_SECONDS, task_id, self.worker_id))
+
+    async def extend_lease(self, task_id: str) -> bool:
+        """Renew the lease of a running task; False if this worker no longer holds it"""
+        updated = await self.db.execute("""
+            UPDATE agent_tasks
+            SET locked_until = NOW() + make_interval(secs => %s), updated_at = NOW()
+            WHERE id = %s AND locked_by = %s AND status = 'running'
+        """, (AGENT_TASK_LEASE_SECONDS, task_id, self.worker_id))
+        return updated > 0
+
+    async def _heartbeat(self, task_id: str):
+        """Keep renewing a task's lease, so long steps are not claimed twice"""
+        while True:
+            await asyncio.sleep(AGENT_TASK_HEARTBEAT_SECONDS)
+            try:
+                if not await self.extend_lease(task_id):
+                    logger.warning(f"Task {task_id} lease was lost")
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error extending lease of task {task_id}: {e}")
+
+    async def complete(self, task_id: str):
+        await self.db.execute("""
+            UPDATE agent_tasks
+            SET status = 'completed', locked_by = NULL, locked_until = NULL,
+                last_error = NULL, updated_at = NOW(), completed_at = NOW()
+            WHERE id = %s AND locked_by = %s
+        """, (task_id, self.worker_id))
+
+    async def fail(self, task: dict, error: str):
+        """Schedule a retry with exponential backoff, or give up after max_attempts"""
+        attempts = task["attempts"]
+        if attempts >= task["max_attempts"]:
+            status, delay = "failed", 0.0
+        else:
+            status = "pending"
+            delay = min(AGENT_TASK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), AGENT_TASK_RETRY_MAX_SECONDS)
+
+        await self.db.execute("""
+            UPDATE agent_tasks
+            SET status = %s, last_error = %s, locked_by = NULL, locked_until = NULL,
+                run_after = NOW() + make_interval(secs => %s), updated_at = NOW(),
+                completed_at = CASE WHEN %s = 'failed' THEN NOW() END
+            WHERE id = %s AND locked_by = %s
+        """, (status, error, delay, status, str(task["id"]), self.worker_id))
+
+    async def release(self, task: dict):
+        """Hand an interrupted task back to the queue without counting the attempt"""
+        await self.db.execute("""
+            UPDATE agent_tasks
+            SET status = 'pending', attempts = GREATEST(attempts - 1, 0),
+                locked_by = NULL, locked_until = NULL, updated_at = NOW()
+            WHERE id = %s AND locked_by = %s
+        """, (str(task["id"]), self.worker_id))
+
+    async def _worker(self, index: int):
+        while not self._stopping:
+            try:
+                task = await self.claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Worker {index} failed to claim a task: {e}")
+                task = None
+
+            if task is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), AGENT_TASK_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._execute(task)
+
+    async def _execute(self, task: dict):
+        task_id = str(task["id"])
+        handler = self.handlers.get(task["task_type"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for task type {task['task_type']}")
+            heartbeat = asyncio.create_task(self._heartbeat(task_id))
+            try:
+                await handler(TaskContext(self, task))
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+            await self.complete(task_id)
+        except asyncio.CancelledError:
+            await asyncio.shield(self.release(task))
+            raise
+        except Exception as e:
+            logger.error(f"Task {task_id} ({task['task_type']}) attempt {task['attempts']} failed: {e}")
+            try:
+                await self.fail(task, str(e))
+            except Exception as fail_error:
+                logger.error(f"Error recording failure of task {task_id}: {fail_error}")
+
+    async def stats(self) -> dict:
+        rows = await self.db.fetchall("SELECT status, COUNT(*) AS count FROM agent_tasks GROUP BY status")
+        return {row["status"]: row["count"] for row in rows}
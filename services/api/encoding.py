@@ -0,0 +1,65 @@
+"""Fast serialization of large API responses.
+
+FastAPI serializes what an endpoint returns by walking it with
+``jsonable_encoder`` and then ``json.dumps``, which dominates the cost of
+large result lists. Endpoints that return many rows instead build plain
+dicts and hand them to ``encode_response``, which serializes them once with
+orjson (the standard library when it is not installed). Clients that send
+``Accept: application/msgpack`` get MessagePack when the msgpack package is
+installed. Compression is left to the GZip middleware.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+import numpy as np
+from fastapi import Request, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def to_primitive(value: Any) -> Any:
+    """Encoder fallback for values from Postgres rows and NumPy"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=to_primitive, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=to_primitive, separators=(",", ":")).encode()
+
+
+def accepts_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def encode_response(
+    request: Request,
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """``content`` as MessagePack if the client asks for it and it is available, JSON otherwise"""
+    headers = {"Vary": "Accept", **(headers or {})}
+    if msgpack is not None and accepts_msgpack(request):
+        body = msgpack.packb(content, default=to_primitive, use_bin_type=True)
+        return Response(body, status_code=status_code, media_type="application/msgpack", headers=headers)
+    return Response(dumps(content), status_code=status_code, media_type="application/json", headers=headers)
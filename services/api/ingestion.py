@@ -0,0 +1,323 @@
+"""Bulk resume ingestion.
+
+Uploaded files are spooled to a temporary directory and processed in
+batches: text extraction fans out as concurrent requests, the batch is embedded
+with one ``/embed-batch`` call, and candidates are written with a multi-row
+insert in a single transaction together with their per-file status rows in
+``ingestion_job_files``. Section chunks of the stored resumes are then
+embedded with one ``/embed-and-store-chunks`` call per batch.
+
+Jobs run as tasks of the api process and their files are spooled to its
+local disk, so a job cannot outlive the process. Jobs left unfinished by a
+previous process are marked failed on startup (``fail_interrupted_jobs``).
+"""
+import asyncio
+import json
+import os
+import shutil
+import uuid
+import zipfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from common.http_client import ServiceClient, ServiceUnavailable
+from common.taxonomy import get_taxonomy
+from common.vectors import stage_rows
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "100"))
+BULK_EXTRACT_WORKERS = int(os.getenv("BULK_EXTRACT_WORKERS", "8"))
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "50000"))
+BULK_REQUEST_TIMEOUT = float(os.getenv("BULK_REQUEST_TIMEOUT", "120"))
+CHUNKED_EMBEDDINGS = os.getenv("CHUNKED_EMBEDDINGS", "true").lower() == "true"
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+INTERRUPTED_ERROR = "Interrupted by an api restart; upload the remaining files again"
+
+
+def spool_uploads(uploads: List[Tuple[str, Any]], directory: str) -> List[Tuple[str, str]]:
+    """Write uploads to ``directory``, expanding zip archives.
+
+    ``uploads`` holds ``(filename, file object)`` pairs. Returns
+    ``(original name, path on disk)`` for every resume found.
+    """
+    files = []
+
+    def add(name: str, source):
+        if len(files) >= BULK_MAX_FILES:
+            raise ValueError(f"At most {BULK_MAX_FILES} files per job")
+        path = os.path.join(directory, f"{len(files):06d}{os.path.splitext(name)[1].lower()}")
+        with open(path, "wb") as target:
+            shutil.copyfileobj(source, target)
+        files.append((name, path))
+
+    for filename, fileobj in uploads:
+        if filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(fileobj) as archive:
+                for member in archive.infolist():
+                    if member.is_dir() or not member.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                        continue
+                    with archive.open(member) as source:
+                        add(os.path.basename(member.filename), source)
+        else:
+            add(filename, fileobj)
+
+    return files
+
+
+class BulkIngestion:
+    """Runs bulk ingestion jobs and records their progress in the database"""
+
+    def __init__(
+        self,
+        db,
+        text_extract: ServiceClient,
+        embeddings: ServiceClient,
+        on_candidates_embedded: Optional[Callable[[List[str]], Awaitable[Any]]] = None,
+    ):
+        self.db = db
+        self.text_extract = text_extract
+        self.embeddings = embeddings
+        self.on_candidates_embedded = on_candidates_embedded
+        self._extract_slots = asyncio.Semaphore(BULK_EXTRACT_WORKERS)
+        self._tasks = set()
+
+    async def create_job(self, files: List[Tuple[str, str]], directory: str) -> str:
+        """Register a job with one status row per file and start processing it"""
+        job_id = str(uuid.uuid4())
+
+        def _create(conn):
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO ingestion_jobs (id, status, total_files) VALUES (%s, 'pending', %s)",
+                    (job_id, len(files))
+                )
+                execute_values(
+                    cursor,
+                    "INSERT INTO ingestion_job_files (job_id, file_index, file_name) VALUES %s",
+                    [(job_id, index, name) for index, (name, _) in enumerate(files)],
+                    page_size=1000
+                )
+
+        await self.db.run(_create)
+
+        task = asyncio.create_task(self.run_job(job_id, files, directory))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def fail_interrupted_jobs(self) -> int:
+        """Mark jobs left pending or running by a previous process as failed.
+
+        Must run before this process starts any job. Returns the number of
+        jobs marked.
+        """
+        def _fail(conn):
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE ingestion_jobs
+                    SET status = 'failed', error = %s, updated_at = NOW(), completed_at = NOW()
+                    WHERE status IN ('pending', 'running')
+                    RETURNING id
+                """, (INTERRUPTED_ERROR,))
+                job_ids = [row[0] for row in cursor.fetchall()]
+                if job_ids:
+                    cursor.execute("""
+                        WITH failed AS (
+                            UPDATE ingestion_job_files
+                            SET status = 'failed', error = %(error)s
+                            WHERE job_id = ANY(%(job_ids)s::uuid[]) AND status = 'pending'
+                            RETURNING job_id
+                        )
+                        UPDATE ingestion_jobs j
+                        SET processed_files = j.processed_files + f.files,
+                            failed_files = j.failed_files + f.files
+                        FROM (SELECT job_id, COUNT(*) AS files FROM failed GROUP BY job_id) f
+                        WHERE j.id = f.job_id
+                    """, {"error": INTERRUPTED_ERROR, "job_ids": job_ids})
+                return len(job_ids)
+
+        return await self.db.run(_fail)
+
+    async def get_job(self, job_id: str, file_status: Optional[str] = None) -> Optional[dict]:
+        job = await self.db.fetchone("SELECT * FROM ingestion_jobs WHERE id = %s", (job_id,))
+        if not job:
+            return None
+
+        query = """
+            SELECT file_index, file_name, status, candidate_id, error
+            FROM ingestion_job_files
+            WHERE job_id = %s
+        """
+        params = [job_id]
+        if file_status:
+            query += " AND status = %s"
+            params.append(file_status)
+        job["files"] = await self.db.fetchall(query + " ORDER BY file_index", params)
+        return job
+
+    async def run_job(self, job_id: str, files: List[Tuple[str, str]], directory: str):
+        try:
+            await self.db.execute(
+                "UPDATE ingestion_jobs SET status = 'running', updated_at = NOW() WHERE id = %s",
+                (job_id,)
+            )
+
+            for start in range(0, len(files), BULK_BATCH_SIZE):
+                batch = list(enumerate(files[start:start + BULK_BATCH_SIZE], start))
+                await self.process_batch(job_id, batch)
+
+            await self.db.execute("""
+                UPDATE ingestion_jobs
+                SET status = 'completed', updated_at = NOW(), completed_at = NOW()
+                WHERE id = %s
+            """, (job_id,))
+
+        except Exception as e:
+            print(f"Error running ingestion job {job_id}: {e}")
+            await self.db.execute("""
+                UPDATE ingestion_jobs
+                SET status = 'failed', error = %s, updated_at = NOW(), completed_at = NOW()
+                WHERE id = %s
+            """, (str(e), job_id))
+
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    async def extract(self, name: str, path: str) -> dict:
+        """Extract one resume through the text-extract service"""
+        async with self._extract_slots:
+            with open(path, "rb") as f:
+                content = await asyncio.to_thread(f.read)
+            response = await self.text_extract.post(
+                "/extract",
+                files={"file": (name, content)},
+                deadline=BULK_REQUEST_TIMEOUT
+            )
+        if response.status_code != 200:
+            raise ValueError(f"Text extraction failed ({response.status_code}): {response.text[:200]}")
+        return response.json()
+
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed a batch of resumes; on failure candidates are stored without embeddings"""
+        try:
+            response = await self.embeddings.post(
+                "/embed-batch",
+                json={"texts": texts},
+                deadline=BULK_REQUEST_TIMEOUT
+            )
+            if response.status_code == 200:
+                return response.json()["embeddings"]
+            print(f"Warning: batch embedding failed: {response.text[:200]}")
+        except ServiceUnavailable as e:
+            print(f"Warning: batch embedding failed: {e}")
+        return [None] * len(texts)
+
+    async def store_chunks(self, candidates: List[Tuple[str, str]]):
+        """Embed and store resume chunks; failures leave candidates without chunks"""
+        try:
+            response = await self.embeddings.post(
+                "/embed-and-store-chunks",
+                json={"candidates": [{"candidate_id": candidate_id, "text": text} for candidate_id, text in candidates]},
+                deadline=BULK_REQUEST_TIMEOUT
+            )
+            if response.status_code != 200:
+                print(f"Warning: chunk embedding failed: {response.text[:200]}")
+        except ServiceUnavailable as e:
+            print(f"Warning: chunk embedding failed: {e}")
+
+    async def process_batch(self, job_id: str, batch: List[Tuple[int, Tuple[str, str]]]):
+        outcomes = await asyncio.gather(
+            *(self.extract(name, path) for _, (name, path) in batch),
+            return_exceptions=True
+        )
+
+        extracted = []
+        statuses: Dict[int, Tuple[str, Optional[str], Optional[str]]] = {}
+        for (index, _), outcome in zip(batch, outcomes):
+            if isinstance(outcome, Exception):
+                statuses[index] = ("failed", None, str(outcome))
+            elif not outcome.get("text", "").strip():
+                statuses[index] = ("failed", None, "No text found in file")
+            else:
+                extracted.append((index, outcome))
+
+        embeddings = []
+        if extracted:
+            embeddings = await self.embed([data["text"] for _, data in extracted])
+
+        taxonomy = get_taxonomy()
+        rows = []
+        for (index, data), embedding in zip(extracted, embeddings):
+            candidate_id = str(uuid.uuid4())
+            skills = taxonomy.canonicalize(data["skills"])
+            rows.append((
+                candidate_id,
+                data["name"],
+                data["email"],
+                data["location"],
+                "Unknown",
+                data["experience_years"],
+                skills,
+                taxonomy.to_ids(skills),
+                data["text"],
+                embedding,
+                json.dumps(data["structured_data"])
+            ))
+            statuses[index] = ("completed", candidate_id, None if embedding else "Embedding failed")
+
+        def _write(conn):
+            with conn.cursor() as cursor:
+                if rows:
+                    # Embeddings travel in binary through a staging table
+                    stage_rows(
+                        cursor,
+                        "staged_embeddings",
+                        [("id", "text"), ("embedding", "vector")],
+                        [(row[0], row[9]) for row in rows if row[9] is not None]
+                    )
+                    execute_values(cursor, """
+                        INSERT INTO candidates (id, name, email, location, work_authorization,
+                                                total_years_experience, skills, skill_ids,
+                                                raw_text, embedding, structured_data)
+                        SELECT v.id::uuid, v.name, v.email, v.location, v.work_authorization,
+                               v.total_years_experience, v.skills, v.skill_ids,
+                               v.raw_text, s.embedding, v.structured_data::jsonb
+                        FROM (VALUES %s) AS v(id, name, email, location, work_authorization,
+                                              total_years_experience, skills, skill_ids,
+                                              raw_text, structured_data)
+                        LEFT JOIN staged_embeddings s ON s.id = v.id
+                    """, [row[:9] + row[10:] for row in rows],
+                        template="(%s, %s, %s, %s, %s, %s::numeric, %s::text[], %s::int[], %s, %s)",
+                        page_size=len(rows))
+
+                execute_values(cursor, """
+                    UPDATE ingestion_job_files f
+                    SET status = v.status, candidate_id = v.candidate_id::uuid, error = v.error
+                    FROM (VALUES %s) AS v(job_id, file_index, status, candidate_id, error)
+                    WHERE f.job_id = v.job_id::uuid AND f.file_index = v.file_index
+                """, [
+                    (job_id, index, status, candidate_id, error)
+                    for index, (status, candidate_id, error) in statuses.items()
+                ], page_size=len(statuses))
+
+                failed = sum(1 for status, _, _ in statuses.values() if status == "failed")
+                cursor.execute("""
+                    UPDATE ingestion_jobs
+                    SET processed_files = processed_files + %s,
+                        failed_files = failed_files + %s,
+                        updated_at = NOW()
+                    WHERE id = %s
+                """, (len(statuses), failed, job_id))
+
+        await self.db.run(_write)
+
+        if rows and CHUNKED_EMBEDDINGS:
+            await self.store_chunks([(row[0], row[8]) for row in rows])
+
+        embedded = [row[0] for row in rows if row[9] is not None]
+        if embedded and self.on_candidates_embedded:
+            try:
+                await self.on_candidates_embedded(embedded)
+            except Exception as e:
+                print(f"Warning: post-ingestion hook failed for job {job_id}: {e}")
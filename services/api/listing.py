@@ -0,0 +1,113 @@
+"""Paginated, projected listing of candidates and job descriptions.
+
+Pages are cut with keyset pagination on ``(created_at, id)`` (served by the
+matching indexes in init.sql), so fetching page N costs the same as page 1
+and rows inserted meanwhile do not shift later pages. The opaque cursor
+returned with each page encodes the last row's key.
+
+``fields`` selects columns from a whitelist that never includes embeddings
+or search vectors. Exports stream NDJSON from a server-side cursor, so their
+memory use in the api does not grow with the table.
+"""
+import base64
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from encoding import dumps
+
+LIST_DEFAULT_LIMIT = int(os.getenv("LIST_DEFAULT_LIMIT", "50"))
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "500"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# table -> columns that may be requested with ?fields=
+SELECTABLE_FIELDS = {
+    "candidates": (
+        "id", "name", "email", "location", "work_authorization", "total_years_experience",
+        "skills", "skill_ids", "structured_data", "raw_text", "created_at",
+    ),
+    "job_descriptions": (
+        "id", "title", "location", "required_skills", "optional_skills", "required_skill_ids",
+        "optional_skill_ids", "min_years_experience", "raw_text", "is_active", "created_at",
+        "updated_at",
+    ),
+}
+
+# table -> columns returned by listings when no fields are requested
+LIST_FIELDS = {
+    "candidates": (
+        "id", "name", "email", "location", "work_authorization",
+        "total_years_experience", "skills", "created_at",
+    ),
+    "job_descriptions": (
+        "id", "title", "location", "required_skills", "optional_skills",
+        "min_years_experience", "created_at",
+    ),
+}
+
+# table -> columns returned by detail endpoints when no fields are requested
+DETAIL_FIELDS = {
+    "candidates": tuple(field for field in SELECTABLE_FIELDS["candidates"] if field != "raw_text"),
+    "job_descriptions": SELECTABLE_FIELDS["job_descriptions"],
+}
+
+
+def parse_fields(table: str, fields: Optional[str], default: Sequence[str]) -> List[str]:
+    """Columns for a comma-separated ``fields`` parameter; ``id`` is always included"""
+    if not fields:
+        return list(default)
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in SELECTABLE_FIELDS[table]]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(SELECTABLE_FIELDS[table])}"
+        )
+    return list(dict.fromkeys(["id"] + requested))
+
+
+def encode_cursor(row: dict) -> str:
+    key = json.dumps([row["created_at"].isoformat(), str(row["id"])])
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), str(uuid.UUID(row_id))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _select(table: str, fields: Sequence[str], cursor: Optional[str]) -> tuple:
+    # The page key is always selected, even when not requested
+    columns = list(dict.fromkeys(list(fields) + ["created_at", "id"]))
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    params: Dict[str, Any] = {}
+    if cursor:
+        params["after_created_at"], params["after_id"] = decode_cursor(cursor)
+        query += " WHERE (created_at, id) < (%(after_created_at)s, %(after_id)s::uuid)"
+    return query + " ORDER BY created_at DESC, id DESC", params
+
+
+def _project(row: dict, fields: Sequence[str]) -> dict:
+    return {field: row[field] for field in fields}
+
+
+async def fetch_page(db, table: str, fields: Sequence[str], limit: int, cursor: Optional[str] = None) -> dict:
+    """One page of rows, newest first, and the cursor of the next page (None on the last)"""
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+    query, params = _select(table, fields, cursor)
+    rows = await db.fetchall(query + " LIMIT %(limit)s", {**params, "limit": limit + 1})
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"items": [_project(row, fields) for row in rows[:limit]], "next_cursor": next_cursor}
+
+
+async def export_ndjson(db, table: str, fields: Sequence[str], cursor: Optional[str] = None) -> AsyncIterator[bytes]:
+    """Every row from ``cursor`` on as newline-delimited JSON, one batch at a time"""
+    query, params = _select(table, fields, cursor)
+    async for rows in db.stream(query, params, EXPORT_BATCH_SIZE):
+        yield b"".join(dumps(_project(row, fields)) + b"\n" for row in rows)
@@ -0,0 +1,206 @@
+"""Materialized top-N candidate matches per active job description.
+
+``candidate_matches`` holds the best ``MATCHES_TOP_N`` scored candidates for
+every active job description so repeated rankings of the same JD are a
+single indexed read. It is maintained incrementally:
+
+* when a job description is created or changes, its matches are rebuilt;
+* when candidates are embedded, only those candidates are scored against
+  the active job descriptions and merged into each JD's top N.
+
+A JD's matches are served only while ``matches_refreshed_at >= updated_at``,
+so an edited or re-embedded JD falls back to a live ranking until rebuilt.
+"""
+import json
+import os
+from collections import defaultdict
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from psycopg2.extras import execute_values
+
+from common.scoring import JD_SCORING_COLUMNS, JD_SCORING_WEIGHTS, rank_rows
+
+MATCHES_TOP_N = int(os.getenv("MATCHES_TOP_N", "200"))
+
+JD_COLUMNS = f"{JD_SCORING_COLUMNS}, jd.embedding, jd.is_active, jd.updated_at, jd.matches_refreshed_at"
+
+# (jd, window) -> shortlist rows as consumed by rank_rows
+ShortlistFetcher = Callable[[dict, int], Awaitable[List[dict]]]
+
+
+def is_fresh(jd: dict) -> bool:
+    """Whether the stored matches reflect the current version of ``jd``"""
+    return (
+        jd.get("is_active", True)
+        and jd.get("matches_refreshed_at") is not None
+        and jd["matches_refreshed_at"] >= jd["updated_at"]
+    )
+
+
+def _match_rows(jd_id: str, shortlist: Sequence[dict], ranked: Sequence[dict]) -> list:
+    return [
+        (
+            jd_id,
+            str(shortlist[item["index"]]["id"]),
+            item["similarity_score"],
+            item["skill_overlap_score"],
+            item["experience_score"],
+            item["final_score"],
+            json.dumps(item["explanation"]),
+        )
+        for item in ranked
+    ]
+
+
+def _upsert(cursor, rows: list):
+    execute_values(cursor, """
+        INSERT INTO candidate_matches (jd_id, candidate_id, similarity_score, skill_overlap_score,
+                                       experience_score, final_score, explanation)
+        VALUES %s
+        ON CONFLICT (jd_id, candidate_id) DO UPDATE SET
+            similarity_score = EXCLUDED.similarity_score,
+            skill_overlap_score = EXCLUDED.skill_overlap_score,
+            experience_score = EXCLUDED.experience_score,
+            final_score = EXCLUDED.final_score,
+            explanation = EXCLUDED.explanation,
+            updated_at = NOW()
+    """, rows, page_size=1000)
+
+
+class MatchStore:
+    """Maintains and serves ``candidate_matches``"""
+
+    def __init__(self, db, fetch_shortlist: ShortlistFetcher, window: int):
+        self.db = db
+        self.fetch_shortlist = fetch_shortlist
+        self.window = max(window, MATCHES_TOP_N)
+
+    async def fetch(self, jd: dict, conditions: List[str], params: dict, limit: int) -> Optional[List[dict]]:
+        """Top ``limit`` stored matches passing the candidate filters.
+
+        Returns None when the materialization cannot answer the request: the
+        JD is stale, or fewer than ``limit`` stored matches pass the filters.
+        """
+        if not 1 <= limit <= MATCHES_TOP_N or not is_fresh(jd):
+            return None
+
+        filter_sql = "".join(f" AND {condition}" for condition in conditions)
+        rows = await self.db.fetchall(f"""
+            SELECT
+                m.candidate_id,
+                c.name,
+                c.email,
+                c.location,
+                COALESCE(c.skills, '{{}}') AS skills,
+                COALESCE(c.total_years_experience, 0)::float AS total_years_experience,
+                m.similarity_score,
+                m.skill_overlap_score,
+                m.experience_score,
+                m.final_score,
+                m.explanation,
+                COUNT(*) OVER () AS total_matches
+            FROM candidate_matches m
+            JOIN candidates c ON c.id = m.candidate_id
+            WHERE m.jd_id = %(jd_id)s{filter_sql}
+            ORDER BY m.final_score DESC
+            LIMIT %(limit)s
+        """, {**params, "jd_id": str(jd["id"]), "limit": limit})
+
+        if len(rows) < limit:
+            return None
+        return rows
+
+    async def refresh_jd(self, jd_id: str) -> int:
+        """Rebuild the stored matches of one job description"""
+        jd = await self.db.fetchone(f"SELECT {JD_COLUMNS} FROM job_descriptions jd WHERE id = %s", (jd_id,))
+        if not jd:
+            return 0
+
+        rows = []
+        if jd["is_active"] and jd["embedding"] is not None:
+            shortlist = await self.fetch_shortlist(jd, self.window)
+            rows = _match_rows(str(jd["id"]), shortlist, rank_rows(jd, shortlist, MATCHES_TOP_N))
+
+        def _write(conn):
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM candidate_matches WHERE jd_id = %s", (jd_id,))
+                if rows:
+                    _upsert(cursor, rows)
+                # Only mark fresh if the JD did not change while we were scoring
+                cursor.execute("""
+                    UPDATE job_descriptions
+                    SET matches_refreshed_at = CASE WHEN is_active THEN updated_at END
+                    WHERE id = %s AND updated_at = %s
+                """, (jd_id, jd["updated_at"]))
+
+        await self.db.run(_write)
+        return len(rows)
+
+    async def refresh_all(self) -> dict:
+        """Rebuild the stored matches of every job description"""
+        jds = await self.db.fetchall("SELECT id FROM job_descriptions ORDER BY created_at")
+        refreshed = {}
+        for jd in jds:
+            refreshed[str(jd["id"])] = await self.refresh_jd(str(jd["id"]))
+        return refreshed
+
+    async def refresh_candidates(self, candidate_ids: Sequence[str]) -> int:
+        """Score newly embedded candidates against every fresh, active JD.
+
+        Only these candidate/JD pairs are scored; each JD's matches are then
+        trimmed back to its top ``MATCHES_TOP_N``.
+        """
+        if not candidate_ids:
+            return 0
+
+        pairs = await self.db.fetchall(f"""
+            SELECT
+                jd.id AS jd_id,
+                jd.required_skills,
+                jd.optional_skills,
+                jd.required_skill_ids,
+                jd.optional_skill_ids,
+                jd.min_years_experience,
+                {JD_SCORING_WEIGHTS},
+                c.id,
+                COALESCE(c.skills, '{{}}') AS skills,
+                c.skill_ids,
+                COALESCE(c.total_years_experience, 0)::float AS total_years_experience,
+                c.created_at,
+                1 - (c.embedding <=> jd.embedding) AS similarity_score
+            FROM candidates c
+            JOIN job_descriptions jd
+              ON jd.is_active
+             AND jd.embedding IS NOT NULL
+             AND jd.matches_refreshed_at >= jd.updated_at
+            WHERE c.id = ANY(%s::uuid[]) AND c.embedding IS NOT NULL
+        """, (list(candidate_ids),))
+
+        by_jd = defaultdict(list)
+        for row in pairs:
+            by_jd[str(row["jd_id"])].append(row)
+
+        rows = []
+        for jd_id, shortlist in by_jd.items():
+            rows.extend(_match_rows(jd_id, shortlist, rank_rows(shortlist[0], shortlist, len(shortlist))))
+        if not rows:
+            return 0
+
+        def _write(conn):
+            with conn.cursor() as cursor:
+                _upsert(cursor, rows)
+                cursor.execute("""
+                    DELETE FROM candidate_matches m
+                    USING (
+                        SELECT jd_id, candidate_id,
+                               row_number() OVER (PARTITION BY jd_id ORDER BY final_score DESC) AS position
+                        FROM candidate_matches
+                        WHERE jd_id = ANY(%s::uuid[])
+                    ) ranked
+                    WHERE m.jd_id = ranked.jd_id
+                      AND m.candidate_id = ranked.candidate_id
+                      AND ranked.position > %s
+                """, (list(by_jd), MATCHES_TOP_N))
+
+        await self.db.run(_write)
+        return len(rows)
@@ -0,0 +1,140 @@
+"""In-process cache of ranking responses.
+
+The agent and the web UI rank the same job descriptions with the same
+filters over and over. Responses are cached per request shape (JD,
+normalized filters, limit, retrieval options and view) and tagged with the
+data version they were computed at.
+
+The data version is the sum of the ``ranking_data_version`` slots maintained
+by statement triggers on candidates, candidate chunks, job descriptions and
+scoring profiles (see init.sql), so new weights invalidate entries like new
+data does. It changes in the same transaction as the data. It is read at
+most every ``RANKING_CACHE_VERSION_POLL_SECONDS``, so writes made by other
+processes show up within that interval; writes made through this api call
+``invalidate`` and show up immediately. Entries also expire after
+``RANKING_CACHE_TTL_SECONDS`` and the least recently used ones are evicted
+beyond ``RANKING_CACHE_MAX_ENTRIES``.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+RANKING_CACHE_MAX_ENTRIES = int(os.getenv("RANKING_CACHE_MAX_ENTRIES", "1000"))
+RANKING_CACHE_TTL_SECONDS = float(os.getenv("RANKING_CACHE_TTL_SECONDS", "300"))
+RANKING_CACHE_VERSION_POLL_SECONDS = float(os.getenv("RANKING_CACHE_VERSION_POLL_SECONDS", "1"))
+
+
+def cache_key(jd_id: str, filter_params: Dict[str, Any], **options: Any) -> str:
+    """Key for a ranking request; ``filter_params`` are the SQL parameters of its filters.
+
+    The filters compare strings case-insensitively and numbers by value, so
+    "Remote" and "remote", or 3 and 3.0, share an entry.
+    """
+    normalized = {
+        name: value.lower() if isinstance(value, str) else float(value) if isinstance(value, (int, float)) else value
+        for name, value in filter_params.items()
+    }
+    return json.dumps(
+        [str(jd_id), normalized, options],
+        sort_keys=True,
+        default=str,
+    )
+
+
+class RankingCache:
+    """LRU of ranking responses, valid while the data version is unchanged"""
+
+    def __init__(
+        self,
+        db,
+        max_entries: int = RANKING_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = RANKING_CACHE_TTL_SECONDS,
+        version_poll_seconds: float = RANKING_CACHE_VERSION_POLL_SECONDS,
+    ):
+        self.db = db
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_poll_seconds = version_poll_seconds
+        # key -> (data version, expiry, response content)
+        self._entries: OrderedDict = OrderedDict()
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+        self._version_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    async def version(self) -> int:
+        """Current data version, re-read once the poll interval has passed"""
+        if self._version is not None and time.monotonic() - self._version_checked_at < self.version_poll_seconds:
+            return self._version
+
+        async with self._version_lock:
+            # Another request may have refreshed it while this one waited
+            if self._version is None or time.monotonic() - self._version_checked_at >= self.version_poll_seconds:
+                row = await self.db.fetchone("SELECT COALESCE(SUM(version), 0)::bigint AS version FROM ranking_data_version")
+                self._version = row["version"]
+                self._version_checked_at = time.monotonic()
+        return self._version
+
+    def invalidate(self):
+        """Re-read the data version on the next lookup, after a write by this process"""
+        self._version_checked_at = 0.0
+
+    def get(self, key: str, version: int) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        entry_version, expires_at, content = entry
+        if entry_version != version or time.monotonic() >= expires_at:
+            if entry_version != version:
+                self.stale += 1
+            else:
+                self.expired += 1
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return content
+
+    def put(self, key: str, version: int, content: Any):
+        """Store ``content`` computed from data at ``version``.
+
+        Results computed before a version change that happened while they
+        were being computed are dropped rather than cached as current.
+        """
+        if not self.enabled or version != self._version:
+            return
+
+        self._entries[key] = (version, time.monotonic() + self.ttl_seconds, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "data_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "stale": self.stale,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
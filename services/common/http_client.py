@@ -0,0 +1,200 @@
+"""Async HTTP client for calls between services.
+
+Each downstream service gets one ``ServiceClient`` per process, holding a
+keep-alive connection pool. Every call has a deadline covering all of its
+attempts. Transport errors and 502/503/504 responses are retried a bounded
+number of times with exponential backoff and full jitter. A circuit breaker
+per service fails calls fast once the service keeps failing (transport
+errors, timeouts or 5xx responses), so a slow
+dependency (e.g. Ollama behind the embeddings service) cannot tie up every
+worker of its callers.
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Optional
+
+import httpx
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "3"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_RETRY_BASE_SECONDS = float(os.getenv("HTTP_RETRY_BASE_SECONDS", "0.2"))
+HTTP_RETRY_MAX_SECONDS = float(os.getenv("HTTP_RETRY_MAX_SECONDS", "2"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+class ServiceUnavailable(Exception):
+    """Raised when a call fails for good: circuit open, deadline spent or retries exhausted"""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, calls are rejected without touching the network. After
+    ``reset_seconds`` a single trial call is let through (half-open); its
+    outcome closes the circuit or opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_running or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    def release(self):
+        """End an attempt that was abandoned by the caller without an outcome"""
+        self._trial_running = False
+
+
+class ServiceClient:
+    """Pooled client for one downstream service"""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        max_retries: int = HTTP_MAX_RETRIES,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.max_connections = max_connections
+        self.breaker = CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        deadline: Optional[float] = None,
+        retries: Optional[int] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send a request, retrying transient failures within ``deadline`` seconds.
+
+        Responses other than 502/503/504 are returned as they are, so callers
+        check ``status_code`` as before; any 5xx still counts against the
+        circuit breaker. Raises ``ServiceUnavailable`` when no
+        usable response was obtained.
+        """
+        deadline_at = time.monotonic() + (deadline or self.timeout)
+        retries = self.max_retries if retries is None else retries
+        self.requests += 1
+        error = "no attempt made"
+
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise ServiceUnavailable(f"{self.name} circuit is open after repeated failures")
+
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = httpx.Timeout(remaining, connect=min(HTTP_CONNECT_TIMEOUT_SECONDS, remaining))
+            try:
+                # httpx timeouts bound each socket operation; wait_for bounds the whole attempt
+                response = await asyncio.wait_for(
+                    self.client.request(method, path, timeout=timeout, **kwargs), remaining
+                )
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                error = "timed out" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+                self.breaker.record_failure()
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+
+            if attempt < retries:
+                delay = random.uniform(0, min(HTTP_RETRY_MAX_SECONDS, HTTP_RETRY_BASE_SECONDS * 2 ** attempt))
+                if time.monotonic() + delay >= deadline_at:
+                    break
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+        self.failures += 1
+        raise ServiceUnavailable(f"{self.name} request {method} {path} failed: {error}")
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,343 @@
+"""Ranking model learned from recruiter feedback.
+
+Training (``train_ranking_model``, run by the agent as feedback arrives or
+with ``python -m common.maintenance train-ranking-model``) labels the latest
+``candidate_feedback`` row per candidate and job description, computes the
+same features the scoring pipeline uses (see common/scoring.py) and fits an
+L2-regularized logistic regression with Newton's method in NumPy. A feedback
+row is tied to its job description by ``jd_id`` or, failing that, by the
+goal of the agent's latest outreach to the candidate. Recency is measured at
+the time of the feedback.
+
+Each run, trained or skipped for lack of data, advances the feedback
+watermark in ``ranking_model_training``; the agent retrains once enough
+feedback has arrived past it. Every fit is stored as a new version in
+``ranking_models``. It is activated
+when its validation AUC reaches ``LEARNED_MIN_AUC``; at most one version is
+active. The api polls for the active version (``ModelRegistry``) and swaps
+it in without a restart; ``/rank-candidates`` requests with ``rerank`` then
+re-order the pipeline's top ``RERANK_WINDOW`` candidates by the model's
+probability of positive feedback.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from psycopg2.extras import RealDictCursor
+
+from common.scoring import ScoringBatch, build_batch, feature_matrix, top_k
+
+LEARNED_FEATURES = ("similarity", "skill_overlap", "experience", "recency")
+LEARNED_L2 = float(os.getenv("LEARNED_L2", "1.0"))
+LEARNED_MIN_SAMPLES = int(os.getenv("LEARNED_MIN_SAMPLES", "50"))
+LEARNED_MIN_AUC = float(os.getenv("LEARNED_MIN_AUC", "0.6"))
+LEARNED_MODEL_POLL_SECONDS = float(os.getenv("LEARNED_MODEL_POLL_SECONDS", "30"))
+# Share of candidates (by ID hash) held out to validate a fit
+VALIDATION_FRACTION = 0.2
+
+POSITIVE_FEEDBACK = {"hired", "offer", "interview_scheduled", "interviewed"}
+NEGATIVE_FEEDBACK = {"rejected", "declined", "not_interested"}
+# Other feedback types are positive when their feedback_score reaches this
+FEEDBACK_POSITIVE_SCORE = 0.5
+
+TRAINING_QUERY = """
+    SELECT DISTINCT ON (f.candidate_id, jd.id)
+        f.feedback_type,
+        f.feedback_score,
+        f.created_at AS feedback_at,
+        jd.id AS jd_id,
+        jd.required_skills,
+        jd.optional_skills,
+        jd.required_skill_ids,
+        jd.optional_skill_ids,
+        jd.min_years_experience,
+        c.id,
+        COALESCE(c.skills, '{}') AS skills,
+        c.skill_ids,
+        COALESCE(c.total_years_experience, 0)::float AS total_years_experience,
+        c.created_at,
+        COALESCE(1 - (c.embedding <=> jd.embedding), 0) AS similarity_score
+    FROM candidate_feedback f
+    JOIN candidates c ON c.id = f.candidate_id
+    JOIN job_descriptions jd ON jd.id = COALESCE(f.jd_id, (
+        SELECT (g.strategy->>'jd_id')::uuid
+        FROM agent_actions a
+        JOIN agent_goals g ON g.id = a.goal_id
+        WHERE a.action_type = 'send_outreach'
+          AND a.result->>'candidate_id' = f.candidate_id::text
+          AND g.strategy ? 'jd_id'
+        ORDER BY a.created_at DESC
+        LIMIT 1
+    ))
+    ORDER BY f.candidate_id, jd.id, f.created_at DESC
+"""
+
+
+def feedback_label(feedback_type: Optional[str], feedback_score: Any) -> Optional[int]:
+    """1 for positive feedback, 0 for negative, None when it says neither"""
+    feedback_type = (feedback_type or "").strip().lower()
+    if feedback_type in POSITIVE_FEEDBACK:
+        return 1
+    if feedback_type in NEGATIVE_FEEDBACK:
+        return 0
+    if feedback_score is not None:
+        return int(float(feedback_score) >= FEEDBACK_POSITIVE_SCORE)
+    return None
+
+
+def sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+
+def fit_logistic_regression(X: np.ndarray, y: np.ndarray, l2: float = LEARNED_L2, iterations: int = 50) -> tuple:
+    """Coefficients and intercept minimizing log loss + ``l2`` / 2 * |coef|^2"""
+    design = np.hstack([np.ones((X.shape[0], 1)), X])
+    penalty = np.full(design.shape[1], l2)
+    penalty[0] = 0.0  # the intercept is not regularized
+    weights = np.zeros(design.shape[1])
+
+    for _ in range(iterations):
+        p = sigmoid(design @ weights)
+        gradient = design.T @ (p - y) + penalty * weights
+        hessian = (design * (p * (1 - p))[:, None]).T @ design + np.diag(penalty + 1e-9)
+        step = np.linalg.solve(hessian, gradient)
+        weights -= step
+        if np.max(np.abs(step)) < 1e-8:
+            break
+    return weights[1:], float(weights[0])
+
+
+def roc_auc(y: np.ndarray, scores: np.ndarray) -> Optional[float]:
+    """Probability that a positive outscores a negative; None without both classes"""
+    positives = int(y.sum())
+    negatives = y.size - positives
+    if not positives or not negatives:
+        return None
+    # Rank of each score, tied scores sharing the average of their ranks
+    _, inverse, counts = np.unique(scores, return_inverse=True, return_counts=True)
+    ranks = (np.cumsum(counts) - (counts - 1) / 2)[inverse]
+    return float((ranks[y == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def log_loss(y: np.ndarray, p: np.ndarray) -> float:
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+class RankingModel:
+    """Logistic regression over standardized pipeline features"""
+
+    model_type = "logistic_regression"
+
+    def __init__(
+        self,
+        features: Sequence[str],
+        mean: Sequence[float],
+        scale: Sequence[float],
+        coef: Sequence[float],
+        intercept: float,
+        version: Optional[int] = None,
+    ):
+        self.features = tuple(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.version = version
+
+    @classmethod
+    def fit(cls, X: np.ndarray, y: np.ndarray, features: Sequence[str] = LEARNED_FEATURES) -> "RankingModel":
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        coef, intercept = fit_logistic_regression((X - mean) / scale, y)
+        return cls(features, mean, scale, coef, intercept)
+
+    @classmethod
+    def from_parameters(cls, parameters: dict, version: Optional[int] = None) -> "RankingModel":
+        return cls(
+            parameters["features"],
+            parameters["mean"],
+            parameters["scale"],
+            parameters["coef"],
+            parameters["intercept"],
+            version,
+        )
+
+    def parameters(self) -> dict:
+        return {
+            "features": list(self.features),
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "coef": self.coef.tolist(),
+            "intercept": self.intercept,
+        }
+
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        return sigmoid(((X - self.mean) / self.scale) @ self.coef + self.intercept)
+
+    def predict(self, batch: ScoringBatch) -> np.ndarray:
+        """Probability of positive feedback for every candidate of the batch"""
+        return self.predict_matrix(feature_matrix(batch, self.features))
+
+
+def _validation_split(candidate_ids: Sequence[str]) -> np.ndarray:
+    """Deterministic held-out mask, so a candidate is always on the same side"""
+    buckets = [int(hashlib.sha256(str(candidate_id).encode()).hexdigest()[:8], 16) for candidate_id in candidate_ids]
+    return np.asarray(buckets) % 1000 < VALIDATION_FRACTION * 1000
+
+
+def load_training_data(cursor, features: Sequence[str] = LEARNED_FEATURES) -> tuple:
+    """Feature matrix, labels and candidate IDs of every labeled feedback row"""
+    cursor.execute(TRAINING_QUERY)
+    by_jd = defaultdict(list)
+    for row in cursor.fetchall():
+        label = feedback_label(row["feedback_type"], row["feedback_score"])
+        if label is not None:
+            by_jd[str(row["jd_id"])].append((dict(row), label))
+
+    matrices, labels, candidate_ids = [], [], []
+    for examples in by_jd.values():
+        rows = [row for row, _ in examples]
+        feedback_at = np.array([row["feedback_at"].timestamp() for row in rows])
+        matrices.append(feature_matrix(build_batch(rows[0], rows, now=feedback_at), features))
+        labels.extend(label for _, label in examples)
+        candidate_ids.extend(str(row["id"]) for row in rows)
+
+    X = np.vstack(matrices) if matrices else np.empty((0, len(features)))
+    return X, np.asarray(labels, dtype=np.float64), candidate_ids
+
+
+def activate_model(cursor, version: int) -> bool:
+    """Make ``version`` the only active model; False if it does not exist"""
+    cursor.execute("SELECT 1 FROM ranking_models WHERE version = %s", (version,))
+    if cursor.fetchone() is None:
+        return False
+    cursor.execute("UPDATE ranking_models SET is_active = FALSE WHERE is_active")
+    cursor.execute(
+        "UPDATE ranking_models SET is_active = TRUE, activated_at = NOW() WHERE version = %s",
+        (version,)
+    )
+    return True
+
+
+def _record_run(cursor, watermark, result: dict):
+    """Advance the feedback watermark to the newest feedback a run has seen"""
+    cursor.execute("""
+        UPDATE ranking_model_training
+        SET feedback_watermark = GREATEST(feedback_watermark, %s), last_run_at = NOW(), last_result = %s
+    """, (watermark, json.dumps(result)))
+
+
+def train_ranking_model(conn, activate: bool = True, min_samples: int = LEARNED_MIN_SAMPLES) -> dict:
+    """Fit a model on all labeled feedback, store it as a new version and maybe activate it"""
+    started = time.perf_counter()
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        # Read before the training data, so feedback arriving in between counts as new
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) AS watermark FROM candidate_feedback")
+        watermark = cursor.fetchone()["watermark"]
+        X, y, candidate_ids = load_training_data(cursor)
+        samples, positives = int(y.size), int(y.sum())
+        if samples < min_samples or positives in (0, samples):
+            result = {
+                "status": "skipped",
+                "reason": f"need {min_samples} labeled samples with both outcomes",
+                "samples": samples,
+                "positives": positives,
+            }
+            _record_run(cursor, watermark, result)
+            conn.commit()
+            return result
+
+        held_out = _validation_split(candidate_ids)
+        validation_auc = validation_loss = None
+        if held_out.any() and (~held_out).any():
+            candidate = RankingModel.fit(X[~held_out], y[~held_out])
+            p = candidate.predict_matrix(X[held_out])
+            validation_auc = roc_auc(y[held_out], p)
+            validation_loss = log_loss(y[held_out], p)
+
+        # The stored model is refit on every sample
+        model = RankingModel.fit(X, y)
+        metrics = {
+            "samples": samples,
+            "positives": positives,
+            "validation_samples": int(held_out.sum()),
+            "validation_auc": validation_auc,
+            "validation_log_loss": validation_loss,
+            "training_auc": roc_auc(y, model.predict_matrix(X)),
+            "training_seconds": round(time.perf_counter() - started, 3),
+        }
+
+        cursor.execute("""
+            INSERT INTO ranking_models (model_type, parameters, metrics)
+            VALUES (%s, %s, %s)
+            RETURNING version
+        """, (model.model_type, json.dumps(model.parameters()), json.dumps(metrics)))
+        version = cursor.fetchone()["version"]
+
+        activated = activate and validation_auc is not None and validation_auc >= LEARNED_MIN_AUC
+        if activated:
+            activate_model(cursor, version)
+        result = {"status": "trained", "version": version, "activated": activated, "metrics": metrics}
+        _record_run(cursor, watermark, result)
+    conn.commit()
+
+    return result
+
+
+def rerank(model: RankingModel, jd: dict, rows: Sequence[dict], ranked: Sequence[dict], limit: int) -> List[dict]:
+    """Re-order pipeline results by the model's score, keeping the best ``limit``.
+
+    ``ranked`` are ``rank_rows`` results for ``rows``; each returned item
+    gains ``learned_score``.
+    """
+    if not ranked:
+        return []
+    scores = model.predict(build_batch(jd, [rows[item["index"]] for item in ranked]))
+    return [{**ranked[i], "learned_score": float(scores[i])} for i in top_k(scores, limit)]
+
+
+class ModelRegistry:
+    """The active ranking model, re-read from the database periodically"""
+
+    def __init__(self, db, poll_seconds: float = LEARNED_MODEL_POLL_SECONDS):
+        self.db = db
+        self.poll_seconds = poll_seconds
+        self.model: Optional[RankingModel] = None
+        self._checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    async def current(self) -> Optional[RankingModel]:
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.poll_seconds:
+            return self.model
+
+        self._checked_at = time.monotonic()
+        try:
+            row = await self.db.fetchone("SELECT version, parameters FROM ranking_models WHERE is_active")
+        except Exception as e:
+            # Keep serving the model already loaded
+            self.error = str(e)
+            return self.model
+
+        self.error = None
+        if row is None:
+            self.model = None
+        elif self.model is None or self.model.version != row["version"]:
+            self.model = RankingModel.from_parameters(row["parameters"], row["version"])
+        return self.model
+
+    def invalidate(self):
+        """Re-read the active version on the next request"""
+        self._checked_at = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "version": self.model.version if self.model else None,
+            "features": list(self.model.features) if self.model else None,
+            "error": self.error,
+        }
@@ -0,0 +1,206 @@
+"""Database maintenance commands.
+
+Usage (from a service container, or with ``services/`` on PYTHONPATH)::
+
+    python -m common.maintenance rebuild-indexes [--no-concurrently]  # after changing EMBEDDING_STORAGE too
+    python -m common.maintenance backfill-skill-ids
+    python -m common.maintenance backfill-chunks [--batch-size N]
+    python -m common.maintenance train-ranking-model [--no-activate] [--min-samples N]
+"""
+import argparse
+import json
+import os
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from common.db import DATABASE_URL
+from common.learning import LEARNED_MIN_SAMPLES, train_ranking_model
+from common.taxonomy import get_taxonomy
+from common.vector_search import EMBEDDING_STORAGE, EMBEDDING_STORAGES, QUANTIZED_TABLES, pgvector_version
+
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+MAINTENANCE_WORK_MEM = os.getenv("MAINTENANCE_WORK_MEM", "1GB")
+
+def storage_indexes(storage: str) -> dict:
+    """Embedding indexes of the tables that follow EMBEDDING_STORAGE"""
+    suffix, expression, opclass, _ = EMBEDDING_STORAGES[storage]
+    return {f"{table}_{suffix}": (table, expression, opclass) for table in QUANTIZED_TABLES}
+
+
+# index name -> (table, indexed expression, operator class)
+ANN_INDEXES = {
+    **storage_indexes(EMBEDDING_STORAGE),
+    "job_descriptions_embedding_hnsw_idx": ("job_descriptions", "embedding", "vector_cosine_ops"),
+}
+
+
+def rebuild_indexes(conn, concurrently: bool = True):
+    """Replace legacy IVFFlat indexes with HNSW and rebuild existing HNSW indexes.
+
+    Indexes of other EMBEDDING_STORAGE settings are dropped once the current
+    one is built, so switching storage frees the old index's memory.
+    """
+    conn.autocommit = True
+    cursor = conn.cursor()
+    mode = " CONCURRENTLY" if concurrently else ""
+    tables = sorted({table for table, _, _ in ANN_INDEXES.values()})
+
+    if EMBEDDING_STORAGE != "vector" and pgvector_version(cursor) < (0, 7):
+        raise SystemExit(f"EMBEDDING_STORAGE={EMBEDDING_STORAGE} needs pgvector 0.7 or later")
+
+    cursor.execute("SELECT set_config('maintenance_work_mem', %s, false)", (MAINTENANCE_WORK_MEM,))
+
+    cursor.execute("""
+        SELECT indexname FROM pg_indexes
+        WHERE tablename = ANY(%s) AND indexdef ILIKE '%%USING ivfflat%%'
+    """, (tables,))
+    for (index_name,) in cursor.fetchall():
+        print(f"Dropping IVFFlat index {index_name}")
+        cursor.execute(f'DROP INDEX{mode} IF EXISTS "{index_name}"')
+
+    for index_name, (table, expression, opclass) in ANN_INDEXES.items():
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (index_name,))
+        if cursor.fetchone()[0]:
+            print(f"Rebuilding {index_name}")
+            cursor.execute(f'REINDEX INDEX{mode} "{index_name}"')
+        else:
+            print(f"Creating {index_name}")
+            cursor.execute(
+                f'CREATE INDEX{mode} "{index_name}" ON {table} '
+                f'USING hnsw (({expression}) {opclass}) '
+                f'WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})'
+            )
+
+    for storage in EMBEDDING_STORAGES:
+        if storage == EMBEDDING_STORAGE:
+            continue
+        for index_name in storage_indexes(storage):
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (index_name,))
+            if cursor.fetchone()[0]:
+                print(f"Dropping {index_name} ({storage} storage)")
+                cursor.execute(f'DROP INDEX{mode} IF EXISTS "{index_name}"')
+
+    for table in tables:
+        cursor.execute(f"ANALYZE {table}")
+
+    cursor.close()
+
+
+# table -> [(skill name column, skill ID column)]
+SKILL_ID_COLUMNS = {
+    "candidates": [("skills", "skill_ids")],
+    "job_descriptions": [
+        ("required_skills", "required_skill_ids"),
+        ("optional_skills", "optional_skill_ids"),
+    ],
+}
+
+
+def backfill_skill_ids(conn):
+    """Recompute skill ID arrays from skill names with the current taxonomy.
+
+    Run after adding aliases to the taxonomy so existing rows pick them up.
+    """
+    taxonomy = get_taxonomy()
+    cursor = conn.cursor()
+    cursor.execute("CREATE TEMP TABLE skill_aliases (alias TEXT PRIMARY KEY, skill_id INTEGER) ON COMMIT DROP")
+    execute_values(
+        cursor,
+        "INSERT INTO skill_aliases (alias, skill_id) VALUES %s",
+        list(taxonomy.ids_by_alias.items()),
+        page_size=1000
+    )
+
+    for table, columns in SKILL_ID_COLUMNS.items():
+        for names_column, ids_column in columns:
+            cursor.execute(f"""
+                UPDATE {table} t
+                SET {ids_column} = ARRAY(
+                    SELECT a.skill_id
+                    FROM unnest(t.{names_column}) WITH ORDINALITY AS s(name, position)
+                    JOIN skill_aliases a ON a.alias = lower(regexp_replace(btrim(s.name), '\\s+', ' ', 'g'))
+                    GROUP BY a.skill_id
+                    ORDER BY min(s.position)
+                )
+                WHERE t.{names_column} IS NOT NULL
+            """)
+            print(f"Updated {cursor.rowcount} rows of {table}.{ids_column}")
+
+    conn.commit()
+    cursor.close()
+
+
+EMBEDDINGS_URL = os.getenv("EMBEDDINGS_URL", "http://embeddings:8002")
+
+
+def backfill_chunks(conn, batch_size: int = 50):
+    """Embed and store section chunks for candidates that have none yet"""
+    import httpx
+
+    cursor = conn.cursor()
+    total = 0
+    while True:
+        cursor.execute("""
+            SELECT c.id::text, c.raw_text
+            FROM candidates c
+            WHERE c.raw_text IS NOT NULL AND btrim(c.raw_text) <> ''
+              AND NOT EXISTS (SELECT 1 FROM candidate_chunks ch WHERE ch.candidate_id = c.id)
+            ORDER BY c.created_at
+            LIMIT %s
+        """, (batch_size,))
+        rows = cursor.fetchall()
+        conn.commit()
+        if not rows:
+            break
+
+        response = httpx.post(
+            f"{EMBEDDINGS_URL}/embed-and-store-chunks",
+            json={"candidates": [{"candidate_id": candidate_id, "text": text} for candidate_id, text in rows]},
+            timeout=600
+        )
+        response.raise_for_status()
+        total += len(rows)
+        print(f"Stored {response.json()['chunks']} chunks for {len(rows)} candidates ({total} total)")
+
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hiring automation database maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild-indexes", help="Create or rebuild the HNSW vector indexes")
+    rebuild.add_argument(
+        "--no-concurrently",
+        action="store_true",
+        help="Lock the tables instead of building concurrently (faster on idle databases)",
+    )
+
+    subparsers.add_parser("backfill-skill-ids", help="Recompute skill ID arrays from the skill taxonomy")
+
+    chunks = subparsers.add_parser("backfill-chunks", help="Embed section chunks of candidates that have none")
+    chunks.add_argument("--batch-size", type=int, default=50, help="Candidates per embeddings request")
+
+    train = subparsers.add_parser("train-ranking-model", help="Fit a ranking model on candidate feedback")
+    train.add_argument("--no-activate", action="store_true", help="Store the model without activating it")
+    train.add_argument("--min-samples", type=int, default=LEARNED_MIN_SAMPLES, help="Labeled feedback rows required")
+
+    args = parser.parse_args()
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        if args.command == "rebuild-indexes":
+            rebuild_indexes(conn, concurrently=not args.no_concurrently)
+        elif args.command == "backfill-skill-ids":
+            backfill_skill_ids(conn)
+        elif args.command == "backfill-chunks":
+            backfill_chunks(conn, args.batch_size)
+        elif args.command == "train-ranking-model":
+            print(json.dumps(train_ranking_model(conn, not args.no_activate, args.min_samples), indent=2))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
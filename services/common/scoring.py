@@ -0,0 +1,321 @@
+"""Candidate scoring pipeline shared by the api and the agent.
+
+A candidate's score is a weighted sum of features. Each feature in
+``FEATURES`` computes its value for a whole batch of candidates at once with
+NumPy; candidate skill IDs (from the shared taxonomy) are encoded against the
+job description's skill IDs, so skill overlap is a row sum over a boolean
+matrix. A ``ScoringPipeline`` compiles a weight profile into the features to
+evaluate and a weight vector, so the final scores are one matrix-vector
+product and only the top-k rows are turned into Python objects.
+
+Weight profiles are rows of ``scoring_profiles`` (feature -> weight), assigned
+per job description with ``job_descriptions.scoring_profile``. Weights are
+normalized to sum to 1, so final scores lie in [0, 1] under every profile. A
+weighted feature with no data for a batch (similarity for keyword search
+results, ``created_at`` when it was not selected) is left out and the other
+weights are scaled up to the same total, so scores stay comparable.
+"""
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from common.taxonomy import get_taxonomy
+
+RECENCY_DECAY_DAYS = float(os.getenv("RECENCY_DECAY_DAYS", "30"))
+
+DEFAULT_PROFILE = "default"
+# Same as the 'default' row seeded in init.sql; used when a JD has no profile
+DEFAULT_WEIGHTS = {"similarity": 0.40, "skill_overlap": 0.35, "experience": 0.25}
+
+# Features reported with every result (similarity_score etc.), whatever their weight
+CORE_FEATURES = ("similarity", "skill_overlap", "experience")
+
+# feature -> key in explanation["similarity_breakdown"]
+BREAKDOWN_KEYS = {
+    "similarity": "semantic_similarity",
+    "skill_overlap": "skill_overlap",
+    "experience": "experience_match",
+    "recency": "recency_bonus",
+}
+
+# Weights of a job description's profile, as an extra column of a query on job_descriptions jd
+JD_SCORING_WEIGHTS = "(SELECT sp.weights FROM scoring_profiles sp WHERE sp.name = jd.scoring_profile) AS scoring_weights"
+# Every job description column scoring reads, for a query on job_descriptions jd
+JD_SCORING_COLUMNS = f"""
+    jd.id, jd.required_skills, jd.optional_skills, jd.required_skill_ids, jd.optional_skill_ids,
+    jd.min_years_experience, {JD_SCORING_WEIGHTS}
+"""
+
+
+def encode_skills(skill_id_lists: Sequence[Sequence[int]], vocabulary: Sequence[int]) -> np.ndarray:
+    """Encode candidate skill IDs as an (n_candidates, len(vocabulary)) boolean matrix"""
+    lengths = np.fromiter((len(ids or ()) for ids in skill_id_lists), dtype=np.int64, count=len(skill_id_lists))
+    flat = np.fromiter(chain.from_iterable(ids or () for ids in skill_id_lists), dtype=np.int64, count=int(lengths.sum()))
+    rows = np.repeat(np.arange(len(skill_id_lists)), lengths)
+
+    matrix = np.zeros((len(skill_id_lists), len(vocabulary)), dtype=bool)
+    if not len(vocabulary) or not flat.size:
+        return matrix
+
+    vocabulary = np.asarray(vocabulary, dtype=np.int64)
+    order = np.argsort(vocabulary)
+    sorted_vocabulary = vocabulary[order]
+    positions = np.minimum(np.searchsorted(sorted_vocabulary, flat), len(vocabulary) - 1)
+    known = sorted_vocabulary[positions] == flat
+    matrix[rows[known], order[positions[known]]] = True
+    return matrix
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _timestamp(value: Any) -> float:
+    if value is None:
+        return -np.inf
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value.timestamp()
+
+
+class ScoringBatch:
+    """Inputs of one scoring pass: a job description and a batch of candidates.
+
+    ``unknown_jd_skills`` are job description skills missing from the
+    taxonomy; no candidate can match them but they count towards the overlap
+    denominator. ``similarity`` and ``created_at`` are optional. ``now`` is
+    the time recency is measured at (a Unix timestamp, or one per candidate);
+    the current time by default.
+    """
+
+    def __init__(
+        self,
+        jd_skill_ids: Sequence[int],
+        skill_names: Dict[int, str],
+        min_years_experience: float,
+        candidate_skill_ids: Sequence[Sequence[int]],
+        experience: Sequence[float],
+        similarity: Optional[Sequence[float]] = None,
+        created_at: Optional[Sequence[Any]] = None,
+        unknown_jd_skills: Sequence[str] = (),
+        now: Optional[Union[float, np.ndarray]] = None,
+    ):
+        self.size = len(candidate_skill_ids)
+        self.vocabulary = list(dict.fromkeys(jd_skill_ids))
+        self.vocabulary_names = [skill_names.get(skill_id, str(skill_id)) for skill_id in self.vocabulary]
+        self.unknown_jd_skills = list(unknown_jd_skills)
+        self.skill_matrix = encode_skills(candidate_skill_ids, self.vocabulary)
+        self.experience = np.asarray(experience, dtype=np.float64)
+        self.similarity = None if similarity is None else np.asarray(similarity, dtype=np.float64)
+        self.created_at = created_at
+        self.now = time.time() if now is None else now
+
+        min_years = float(min_years_experience or 0)
+        if min_years > 0:
+            self.experience_ratio = self.experience / min_years
+        else:
+            self.experience_ratio = np.ones(self.size)
+
+
+# feature name -> function returning one value per candidate, or None without data
+FEATURES: Dict[str, Callable[[ScoringBatch], Optional[np.ndarray]]] = {}
+
+
+def feature(name: str):
+    """Register a feature under ``name`` for use in weight profiles"""
+    def register(function: Callable[[ScoringBatch], Optional[np.ndarray]]):
+        FEATURES[name] = function
+        return function
+    return register
+
+
+@feature("similarity")
+def similarity_feature(batch: ScoringBatch) -> Optional[np.ndarray]:
+    return batch.similarity
+
+
+@feature("skill_overlap")
+def skill_overlap_feature(batch: ScoringBatch) -> np.ndarray:
+    total_skills = len(batch.vocabulary) + len(batch.unknown_jd_skills)
+    if not total_skills:
+        return np.zeros(batch.size)
+    return batch.skill_matrix.sum(axis=1) / total_skills
+
+
+@feature("experience")
+def experience_feature(batch: ScoringBatch) -> np.ndarray:
+    return np.minimum(batch.experience_ratio, 1.0)
+
+
+@feature("recency")
+def recency_feature(batch: ScoringBatch) -> Optional[np.ndarray]:
+    """1 for a candidate added now, decaying linearly to 0 over RECENCY_DECAY_DAYS"""
+    if batch.created_at is None:
+        return None
+    created = np.fromiter((_timestamp(value) for value in batch.created_at), dtype=np.float64, count=batch.size)
+    age_days = (batch.now - created) / 86400
+    return np.clip(1 - age_days / RECENCY_DECAY_DAYS, 0.0, 1.0)
+
+
+class ScoringPipeline:
+    """A weight profile compiled into a vectorized scorer"""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        weights = DEFAULT_WEIGHTS if weights is None else weights
+        unknown = [name for name in weights if name not in FEATURES]
+        if unknown:
+            raise ValueError(f"Unknown scoring features: {', '.join(unknown)}. Available: {', '.join(FEATURES)}")
+        if any(not isinstance(weight, (int, float)) or weight < 0 for weight in weights.values()):
+            raise ValueError("Scoring weights must be non-negative numbers")
+        if not sum(weights.values()):
+            raise ValueError("At least one scoring weight must be positive")
+
+        total = float(sum(weights.values()))
+        self.weights = {name: weight / total for name, weight in weights.items() if weight > 0}
+        self.features = tuple(dict.fromkeys(CORE_FEATURES + tuple(self.weights)))
+        self._weight_vector = np.array([self.weights.get(name, 0.0) for name in self.features])
+
+    def evaluate(self, batch: ScoringBatch) -> tuple:
+        """Feature values by name (None when unavailable) and final scores"""
+        values = {name: FEATURES[name](batch) for name in self.features}
+        available = np.array([values[name] is not None for name in self.features])
+
+        weights = self._weight_vector * available
+        if weights.sum() > 0:
+            weights *= self._weight_vector.sum() / weights.sum()
+
+        matrix = np.zeros((batch.size, len(self.features)))
+        for column, name in enumerate(self.features):
+            if values[name] is not None:
+                matrix[:, column] = values[name]
+        return values, matrix @ weights
+
+    def rank(self, batch: ScoringBatch, limit: int) -> List[Dict[str, Any]]:
+        """Score all candidates and return the top ``limit`` with explanations.
+
+        Each result carries ``index``, the position of the candidate in the
+        batch, so callers can join back to their own rows.
+        """
+        values, final = self.evaluate(batch)
+
+        def value(name: str, index: int) -> float:
+            return float(values[name][index]) if values[name] is not None else 0.0
+
+        results = []
+        for index in top_k(final, limit):
+            matched = batch.skill_matrix[index]
+            results.append({
+                "index": int(index),
+                "similarity_score": value("similarity", index),
+                "skill_overlap_score": value("skill_overlap", index),
+                "experience_score": value("experience", index),
+                "final_score": float(final[index]),
+                "explanation": {
+                    "matched_skills": [batch.vocabulary_names[j] for j in np.flatnonzero(matched)],
+                    "missing_skills": [batch.vocabulary_names[j] for j in np.flatnonzero(~matched)] + batch.unknown_jd_skills,
+                    "experience_ratio": float(batch.experience_ratio[index]),
+                    "similarity_breakdown": {
+                        BREAKDOWN_KEYS.get(name, name): float(values[name][index])
+                        for name in self.features
+                        if values[name] is not None
+                    }
+                }
+            })
+        return results
+
+
+def feature_matrix(batch: ScoringBatch, features: Sequence[str]) -> np.ndarray:
+    """(n_candidates, len(features)) matrix of feature values; unavailable features are 0"""
+    matrix = np.zeros((batch.size, len(features)))
+    for column, name in enumerate(features):
+        values = FEATURES[name](batch)
+        if values is not None:
+            matrix[:, column] = values
+    return matrix
+
+
+@lru_cache(maxsize=128)
+def _compiled(weights: tuple) -> ScoringPipeline:
+    return ScoringPipeline(dict(weights))
+
+
+def get_pipeline(weights: Optional[Dict[str, float]] = None) -> ScoringPipeline:
+    """Compiled pipeline for a weight profile, reused across requests"""
+    return _compiled(tuple(sorted((weights or DEFAULT_WEIGHTS).items())))
+
+
+def build_batch(jd: dict, rows: Sequence[dict], now: Optional[Union[float, np.ndarray]] = None) -> ScoringBatch:
+    """Scoring inputs for candidate rows and a job description row.
+
+    Rows carry ``skills``, ``skill_ids`` and ``total_years_experience``, and
+    optionally ``similarity_score`` and ``created_at``. The JD carries
+    ``required_skills``, ``optional_skills``, their ``*_skill_ids`` and
+    ``min_years_experience``. Skills are compared by taxonomy ID; rows
+    written before the taxonomy existed fall back to resolving their names.
+    """
+    taxonomy = get_taxonomy()
+    jd_skills = (jd.get("required_skills") or []) + (jd.get("optional_skills") or [])
+    if jd.get("required_skill_ids") is not None:
+        jd_skill_ids = (jd["required_skill_ids"] or []) + (jd.get("optional_skill_ids") or [])
+    else:
+        jd_skill_ids = taxonomy.to_ids(jd_skills)
+
+    return ScoringBatch(
+        jd_skill_ids=jd_skill_ids,
+        skill_names=taxonomy.names_by_id,
+        min_years_experience=jd.get("min_years_experience"),
+        candidate_skill_ids=[
+            row["skill_ids"] if row.get("skill_ids") is not None else taxonomy.to_ids(row.get("skills") or [])
+            for row in rows
+        ],
+        experience=[float(row.get("total_years_experience") or 0) for row in rows],
+        similarity=(
+            [row["similarity_score"] or 0 for row in rows]
+            if rows and all("similarity_score" in row for row in rows) else None
+        ),
+        created_at=(
+            [row["created_at"] for row in rows]
+            if rows and all("created_at" in row for row in rows) else None
+        ),
+        unknown_jd_skills=[
+            skill for skill in taxonomy.canonicalize(jd_skills) if taxonomy.skill_id(skill) is None
+        ],
+        now=now,
+    )
+
+
+def rank_rows(jd: dict, rows: Sequence[dict], limit: int) -> List[Dict[str, Any]]:
+    """Rank candidate rows (see ``build_batch``) with the JD's ``scoring_weights``.
+
+    The weights come from ``JD_SCORING_WEIGHTS``; the default profile is used
+    when they are missing.
+    """
+    return get_pipeline(jd.get("scoring_weights")).rank(build_batch(jd, rows), limit)
+
+
+async def fetch_scoring_jd(db, jd_id: str) -> Optional[dict]:
+    """A job description with the columns ``rank_rows`` uses, or None"""
+    return await db.fetchone(f"SELECT {JD_SCORING_COLUMNS} FROM job_descriptions jd WHERE jd.id = %s::uuid", (jd_id,))
+
+
+async def fetch_profile_weights(db, jd_id: Optional[str] = None) -> Optional[Dict[str, float]]:
+    """Weights of a job description's profile, or of the default profile"""
+    row = await db.fetchone("""
+        SELECT weights FROM scoring_profiles
+        WHERE name = COALESCE(
+            (SELECT scoring_profile FROM job_descriptions WHERE id = %s::uuid), %s
+        )
+    """, (jd_id, DEFAULT_PROFILE))
+    return row["weights"] if row else None
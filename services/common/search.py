@@ -0,0 +1,187 @@
+"""Ranked full-text and hybrid search over candidates and job descriptions.
+
+Both tables carry a generated ``search_vector`` column with a GIN index (see
+init.sql). Queries use ``websearch_to_tsquery`` syntax: plain words are
+ANDed, ``"quoted phrases"`` match adjacent words, ``or`` and ``-word`` work
+as on web search engines.
+"""
+import os
+from typing import Iterable, List, Optional, Sequence
+
+from psycopg2.extras import RealDictCursor
+
+from common.vector_search import nearest_query
+
+# Must match the configuration of the generated search_vector columns,
+# otherwise the GIN indexes cannot be used
+TEXT_SEARCH_CONFIG = "english"
+
+# Reciprocal rank fusion constant; larger values flatten the head of each ranking
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Distinct words used as the keyword query when none is given explicitly
+HYBRID_MAX_TERMS = int(os.getenv("HYBRID_MAX_TERMS", "32"))
+
+SEARCH_MODES = ("vector", "hybrid")
+
+# How per-chunk similarities are combined into one candidate score
+CHUNK_AGGREGATIONS = ("max", "topk_mean")
+
+# table -> columns returned by text_search (never raw text or embeddings)
+SEARCH_COLUMNS = {
+    "candidates": (
+        "id", "name", "email", "location", "work_authorization",
+        "total_years_experience", "skills", "skill_ids", "created_at",
+    ),
+    "job_descriptions": (
+        "id", "title", "location", "required_skills", "optional_skills",
+        "min_years_experience", "created_at",
+    ),
+}
+
+
+def tsquery(param: str = "%s") -> str:
+    """SQL parsing the web search query bound to ``param``"""
+    return f"websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', {param})"
+
+
+def phrase(text: str) -> str:
+    """Quote ``text`` so it is searched as a phrase"""
+    return '"' + " ".join(text.replace('"', " ").split()) + '"'
+
+
+def any_of(terms: Iterable[str]) -> str:
+    """Web search query matching any of ``terms``"""
+    return " or ".join(term.strip() for term in terms if term and term.strip())
+
+
+def keywords_from_text(text: str) -> str:
+    """Web search query matching any of the first distinct words of ``text``"""
+    words = dict.fromkeys(word for word in text.replace('"', " ").split() if word.lower() != "or")
+    return any_of(list(words)[:HYBRID_MAX_TERMS])
+
+
+def text_search(
+    conn,
+    table: str,
+    terms: Sequence[str],
+    limit: int = 20,
+    columns: Optional[Sequence[str]] = None,
+) -> List[dict]:
+    """Rows of ``table`` matching any of ``terms``, best ``ts_rank_cd`` first"""
+    if table not in SEARCH_COLUMNS:
+        raise ValueError(f"Unsupported search table: {table}")
+    columns = columns or SEARCH_COLUMNS[table]
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(f"""
+            SELECT {", ".join(f"t.{column}" for column in columns)},
+                   ts_rank_cd(t.search_vector, q.query) AS rank
+            FROM {table} t, (SELECT {tsquery()} AS query) q
+            WHERE t.search_vector @@ q.query
+            ORDER BY rank DESC, t.created_at DESC
+            LIMIT %s
+        """, (any_of(terms), limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def hybrid_candidates_query(columns: str, filter_sql: str = "") -> str:
+    """Candidates ranked by reciprocal rank fusion of vector and full-text search.
+
+    The nearest-neighbour and keyword rankings run as CTEs of one statement,
+    each cut at ``%(window)s`` rows, and are fused with
+    ``sum(1 / (RRF_K + rank))``. Expects ``%(embedding)s``, ``%(keywords)s``,
+    ``%(window)s`` and ``%(limit)s`` parameters. ``columns`` may reference the
+    candidate ``c`` and the fused ranking ``f`` (``rrf_score``,
+    ``semantic_rank``, ``lexical_rank``); ``filter_sql`` is appended to both
+    rankings' conditions on ``c``.
+    """
+    nearest = nearest_query(
+        "c.id, c.embedding <=> %(embedding)s::vector AS distance",
+        "candidates c",
+        f"c.embedding IS NOT NULL{filter_sql}",
+        "%(window)s",
+    )
+    return f"""
+        WITH semantic AS (
+            SELECT id, row_number() OVER (ORDER BY distance) AS rank
+            FROM ({nearest}) nearest
+        ),
+        lexical AS (
+            SELECT id, row_number() OVER (ORDER BY score DESC) AS rank
+            FROM (
+                SELECT c.id, ts_rank_cd(c.search_vector, q.query) AS score
+                FROM candidates c, (SELECT {tsquery("%(keywords)s")} AS query) q
+                WHERE c.search_vector @@ q.query{filter_sql}
+                ORDER BY score DESC
+                LIMIT %(window)s
+            ) matched
+        ),
+        fused AS (
+            SELECT
+                COALESCE(s.id, l.id) AS id,
+                s.rank AS semantic_rank,
+                l.rank AS lexical_rank,
+                COALESCE(1.0 / ({RRF_K} + s.rank), 0) + COALESCE(1.0 / ({RRF_K} + l.rank), 0) AS rrf_score
+            FROM semantic s
+            FULL OUTER JOIN lexical l ON l.id = s.id
+        )
+        SELECT {columns}
+        FROM fused f
+        JOIN candidates c ON c.id = f.id
+        ORDER BY f.rrf_score DESC
+        LIMIT %(limit)s
+    """
+
+
+def chunked_candidates_query(columns: str, filter_sql: str = "", aggregation: str = "max") -> str:
+    """Candidates ranked by the similarity of their best-matching resume chunks.
+
+    The nearest ``%(chunk_window)s`` chunks (HNSW on ``candidate_chunks``)
+    select the candidates; every chunk of those candidates is then scored
+    exactly and aggregated per candidate as ``max_similarity`` (max-sim) and
+    ``topk_similarity`` (mean of the best ``%(top_k)s`` chunks).
+    ``aggregation`` picks which one orders the result. Expects
+    ``%(embedding)s``, ``%(chunk_window)s``, ``%(top_k)s`` and ``%(window)s``
+    parameters. ``columns`` may reference the candidate ``c`` and the chunk
+    scores ``s`` (also ``best_section``, ``chunk_count``); ``filter_sql`` is
+    applied to ``c`` after chunk retrieval, so selective filters need a wider
+    chunk window.
+    """
+    if aggregation not in CHUNK_AGGREGATIONS:
+        raise ValueError(f"Unsupported chunk aggregation: {aggregation}")
+    score = "max_similarity" if aggregation == "max" else "topk_similarity"
+    nearest = nearest_query("ch.candidate_id", "candidate_chunks ch", "TRUE", "%(chunk_window)s", column="ch.embedding")
+
+    return f"""
+        WITH shortlisted AS (
+            SELECT DISTINCT candidate_id
+            FROM ({nearest}) nearest
+        ),
+        ranked_chunks AS (
+            SELECT
+                ch.candidate_id,
+                ch.section,
+                1 - (ch.embedding <=> %(embedding)s::vector) AS similarity,
+                row_number() OVER (
+                    PARTITION BY ch.candidate_id ORDER BY ch.embedding <=> %(embedding)s::vector
+                ) AS position
+            FROM candidate_chunks ch
+            JOIN shortlisted USING (candidate_id)
+        ),
+        chunk_scores AS (
+            SELECT
+                candidate_id,
+                MAX(similarity) AS max_similarity,
+                AVG(similarity) FILTER (WHERE position <= %(top_k)s) AS topk_similarity,
+                MIN(section) FILTER (WHERE position = 1) AS best_section,
+                COUNT(*) AS chunk_count
+            FROM ranked_chunks
+            GROUP BY candidate_id
+        )
+        SELECT {columns}
+        FROM chunk_scores s
+        JOIN candidates c ON c.id = s.candidate_id
+        WHERE TRUE{filter_sql}
+        ORDER BY s.{score} DESC
+        LIMIT %(window)s
+    """
@@ -0,0 +1,158 @@
+"""Skill taxonomy shared by all services.
+
+The taxonomy (``skills.json`` next to this module, or ``SKILL_TAXONOMY_PATH``)
+assigns each canonical skill a stable integer ID and a list of aliases. It is
+loaded into a precompiled in-memory index per process and reloaded when the
+file changes, so skills can be stored and compared as integer IDs.
+
+All aliases are compiled into one regular expression whose
+alternation is factored as a trie, so the regex engine walks shared prefixes
+once instead of trying every alias at every position. Matches must sit on
+word boundaries, so short aliases such as ``pg`` or ``ai`` no longer match
+inside unrelated words.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+SKILL_TAXONOMY_PATH = os.getenv(
+    "SKILL_TAXONOMY_PATH", os.path.join(os.path.dirname(__file__), "skills.json")
+)
+TAXONOMY_RELOAD_SECONDS = float(os.getenv("TAXONOMY_RELOAD_SECONDS", "30"))
+
+# Characters that continue a token: "c" must not match inside "c++" or "c#"
+_TOKEN_CHARS = r"\w+#"
+
+
+def _trie_regex(words: List[str]) -> str:
+    """Build a prefix-factored alternation matching exactly ``words``"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        ends = "" in node
+        branches = []
+        for char in sorted(key for key in node if key):
+            # Aliases may contain runs of whitespace in the source text
+            token = r"\s+" if char == " " else re.escape(char)
+            branches.append(token + emit(node[char]))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            # Prefer the longer alias; fall back to the shorter one
+            return "(?:" + body + ")?"
+        return body
+
+    return emit(trie)
+
+
+def normalize_alias(alias: str) -> str:
+    return " ".join(alias.lower().split())
+
+
+class SkillTaxonomy:
+    """Precompiled index over canonical skills, their IDs and aliases"""
+
+    def __init__(self, skills: List[dict], version=None):
+        self.version = version
+        self.ids_by_alias: Dict[str, int] = {}
+        self.names_by_id: Dict[int, str] = {}
+        for skill in skills:
+            skill_id = int(skill["id"])
+            self.names_by_id[skill_id] = skill["name"]
+            for alias in [skill["name"], *skill.get("aliases", [])]:
+                normalized = normalize_alias(alias)
+                if normalized:
+                    self.ids_by_alias.setdefault(normalized, skill_id)
+
+        pattern = _trie_regex(list(self.ids_by_alias)) if self.ids_by_alias else r"(?!)"
+        self.pattern = re.compile(
+            rf"(?<![{_TOKEN_CHARS}])(?:{pattern})(?![{_TOKEN_CHARS}])",
+            re.IGNORECASE
+        )
+
+    def find_ids(self, text: str) -> List[int]:
+        """IDs of skills mentioned in ``text``, in order of first mention"""
+        found = {}
+        for match in self.pattern.finditer(text):
+            skill_id = self.ids_by_alias.get(normalize_alias(match.group(0)))
+            if skill_id is not None:
+                found.setdefault(skill_id, None)
+        return list(found)
+
+    def find(self, text: str) -> List[str]:
+        """Canonical names of skills mentioned in ``text``"""
+        return self.names(self.find_ids(text))
+
+    def skill_id(self, name: str) -> Optional[int]:
+        """ID for a canonical name or alias, in any case"""
+        return self.ids_by_alias.get(normalize_alias(name))
+
+    def to_ids(self, names: Iterable[str]) -> List[int]:
+        """IDs of the known skills in ``names``, deduplicated"""
+        ids = {}
+        for name in names or ():
+            skill_id = self.skill_id(name)
+            if skill_id is not None:
+                ids.setdefault(skill_id, None)
+        return list(ids)
+
+    def names(self, ids: Iterable[int]) -> List[str]:
+        return [self.names_by_id[skill_id] for skill_id in ids if skill_id in self.names_by_id]
+
+    def canonicalize(self, names: Iterable[str]) -> List[str]:
+        """Map names and aliases to canonical names; unknown skills are kept lowercased"""
+        result = {}
+        for name in names or ():
+            skill_id = self.skill_id(name)
+            canonical = self.names_by_id[skill_id] if skill_id is not None else normalize_alias(name)
+            if canonical:
+                result.setdefault(canonical, None)
+        return list(result)
+
+
+def load_taxonomy(path: str) -> SkillTaxonomy:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return SkillTaxonomy(data["skills"], version=data.get("version"))
+
+
+_taxonomy: Optional[SkillTaxonomy] = None
+_taxonomy_mtime = 0.0
+_next_check = 0.0
+_lock = threading.Lock()
+
+
+def get_taxonomy() -> SkillTaxonomy:
+    """Current taxonomy, reloaded when the file has changed.
+
+    The file is stat'ed at most every ``TAXONOMY_RELOAD_SECONDS``; a reload
+    that fails keeps serving the previous taxonomy.
+    """
+    global _taxonomy, _taxonomy_mtime, _next_check
+    now = time.monotonic()
+    if _taxonomy is not None and now < _next_check:
+        return _taxonomy
+
+    with _lock:
+        if _taxonomy is not None and now < _next_check:
+            return _taxonomy
+        _next_check = now + TAXONOMY_RELOAD_SECONDS
+        try:
+            mtime = os.path.getmtime(SKILL_TAXONOMY_PATH)
+            if _taxonomy is None or mtime != _taxonomy_mtime:
+                _taxonomy = load_taxonomy(SKILL_TAXONOMY_PATH)
+                _taxonomy_mtime = mtime
+        except (OSError, ValueError, KeyError) as e:
+            if _taxonomy is None:
+                raise
+            print(f"Warning: keeping previous skill taxonomy, reload failed: {e}")
+        return _taxonomy
@@ -0,0 +1,180 @@
+"""Approximate nearest neighbour query helpers.
+
+Vector columns are indexed with HNSW (see init.sql). Search breadth,
+``hnsw.ef_search``, is set per transaction so each request can trade recall
+for speed without affecting other sessions.
+
+The index over candidate (and candidate chunk) embeddings can be built over
+a compact representation of the stored float32 vectors, selected with
+``EMBEDDING_STORAGE``:
+
+* ``vector``: full precision (default);
+* ``halfvec``: float16, half the index size;
+* ``binary``: one bit per dimension, 1/32 of the size.
+
+The ``embedding`` column itself keeps full precision, so quantized scans
+fetch ``EMBEDDING_RESCORE_FACTOR`` times more rows than needed and re-rank
+them by exact cosine distance (see ``nearest_query``). Quantized storage
+needs pgvector 0.7+; build the matching index with
+``python -m common.maintenance rebuild-indexes``.
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+ANN_DEFAULT_EF_SEARCH = int(os.getenv("ANN_DEFAULT_EF_SEARCH", "40"))
+# pgvector rejects larger values
+ANN_MAX_EF_SEARCH = 1000
+
+EMBEDDING_DIMENSIONS = 768
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector")
+EMBEDDING_RESCORE_FACTOR = int(os.getenv("EMBEDDING_RESCORE_FACTOR", "4"))
+
+# storage -> (index name suffix, indexed expression, operator class, distance operator)
+EMBEDDING_STORAGES: Dict[str, Tuple[str, str, str, str]] = {
+    "vector": ("embedding_hnsw_idx", "embedding", "vector_cosine_ops", "<=>"),
+    "halfvec": (
+        "embedding_halfvec_hnsw_idx",
+        f"embedding::halfvec({EMBEDDING_DIMENSIONS})",
+        "halfvec_cosine_ops",
+        "<=>",
+    ),
+    "binary": (
+        "embedding_binary_hnsw_idx",
+        f"binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS})",
+        "bit_hamming_ops",
+        "<~>",
+    ),
+}
+# Tables whose embedding index follows EMBEDDING_STORAGE
+QUANTIZED_TABLES = ("candidates", "candidate_chunks")
+
+if EMBEDDING_STORAGE not in EMBEDDING_STORAGES:
+    raise ValueError(f"EMBEDDING_STORAGE must be one of {', '.join(EMBEDDING_STORAGES)}")
+
+_pgvector_version: Optional[Tuple[int, ...]] = None
+
+
+def pgvector_version(cursor) -> Tuple[int, ...]:
+    global _pgvector_version
+    if _pgvector_version is None:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cursor.fetchone()
+        version = row["extversion"] if isinstance(row, dict) else (row[0] if row else "0")
+        _pgvector_version = tuple(int(part) for part in version.split(".")[:2] if part.isdigit())
+    return _pgvector_version
+
+
+def _supports_iterative_scan(cursor) -> bool:
+    """pgvector 0.8+ can keep scanning the graph when filters drop rows"""
+    return pgvector_version(cursor) >= (0, 8)
+
+
+def ann_distance(column: str, param: str, storage: str = EMBEDDING_STORAGE) -> str:
+    """Distance expression served by the ``storage`` index on ``column``.
+
+    ``column`` is ``embedding`` qualified by a table alias; it must be the
+    same expression the index was built on, so keep them in sync.
+    """
+    _, expression, _, operator = EMBEDDING_STORAGES[storage]
+    indexed = expression.replace("embedding", column)
+    query = expression.replace("embedding", f"{param}::vector")
+    return f"{indexed} {operator} {query}"
+
+
+def ann_limit(limit: int, storage: str = EMBEDDING_STORAGE) -> int:
+    """Rows to fetch from the index for ``limit`` re-scored results"""
+    return limit if storage == "vector" else limit * EMBEDDING_RESCORE_FACTOR
+
+
+def nearest_query(
+    columns: str,
+    from_sql: str,
+    where_sql: str,
+    limit: str,
+    column: str = "c.embedding",
+    param: str = "%(embedding)s",
+    storage: str = EMBEDDING_STORAGE,
+) -> str:
+    """Rows nearest to ``param`` by exact cosine distance.
+
+    With full-precision storage this is a plain index-ordered scan. With
+    quantized storage the index scan returns ``EMBEDDING_RESCORE_FACTOR``
+    times ``limit`` rows (an SQL expression), which are re-ranked by exact
+    distance; they then carry an extra ``exact_distance`` column.
+    """
+    exact = f"{column} <=> {param}::vector"
+    if storage == "vector":
+        return f"""
+            SELECT {columns}
+            FROM {from_sql}
+            WHERE {where_sql}
+            ORDER BY {exact}
+            LIMIT {limit}
+        """
+    return f"""
+        SELECT * FROM (
+            SELECT {columns}, {exact} AS exact_distance
+            FROM {from_sql}
+            WHERE {where_sql}
+            ORDER BY {ann_distance(column, param, storage)}
+            LIMIT ({limit}) * {EMBEDDING_RESCORE_FACTOR}
+        ) rescored
+        ORDER BY exact_distance
+        LIMIT {limit}
+    """
+
+
+def set_search_breadth(cursor, ef_search: Optional[int] = None, limit: Optional[int] = None):
+    """Set ``hnsw.ef_search`` for the current transaction.
+
+    An HNSW scan returns at most ``ef_search`` rows, so without an explicit
+    breadth it is raised to cover ``limit`` where possible. An explicit
+    ``ef_search`` is honoured as given and also caps the rows returned.
+    """
+    breadth = ef_search or max(ANN_DEFAULT_EF_SEARCH, limit or 0)
+    breadth = max(1, min(breadth, ANN_MAX_EF_SEARCH))
+    cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(breadth),))
+
+    if _supports_iterative_scan(cursor):
+        cursor.execute("SELECT set_config('hnsw.iterative_scan', 'strict_order', true)")
+
+
+def fetch_nearest(
+    conn,
+    query: str,
+    params: Any = None,
+    ef_search: Optional[int] = None,
+    limit: Optional[int] = None,
+    expected_rows: Optional[int] = None,
+) -> List[dict]:
+    """Run an ANN query with the given search breadth in one transaction.
+
+    ``limit`` is the number of rows the query takes from the index and
+    ``expected_rows`` the number it returns when enough rows pass its
+    filters. Before pgvector 0.8 an HNSW scan stops after ``ef_search``
+    rows (at most ``ANN_MAX_EF_SEARCH``), so unless ``ef_search`` is given
+    explicitly, a result shorter than ``expected_rows`` is re-read with an
+    exact scan.
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        set_search_breadth(cursor, ef_search, limit)
+        cursor.execute(query, params)
+        rows = [dict(row) for row in cursor.fetchall()]
+        if (
+            ef_search is None
+            and expected_rows is not None
+            and len(rows) < expected_rows
+            and not _supports_iterative_scan(cursor)
+        ):
+            # Filters may have dropped rows the capped scan returned
+            return _fetch_exact(cursor, query, params)
+        return rows
+
+
+def _fetch_exact(cursor, query: str, params: Any) -> List[dict]:
+    """Run ``query`` without index scans, so vector ordering is exhaustive"""
+    cursor.execute("SELECT set_config('enable_indexscan', 'off', true)")
+    cursor.execute(query, params)
+    return [dict(row) for row in cursor.fetchall()]
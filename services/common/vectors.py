@@ -0,0 +1,91 @@
+"""Binary transfer of pgvector values between Python and Postgres.
+
+The text form of a 768-dimension vector is 10-15 KB of decimal digits that
+Postgres has to parse on every write. Bulk writes instead stage rows in a
+temporary table with ``COPY ... (FORMAT BINARY)``, where a vector travels as
+its 3 KB float32 wire format, and reads use ``vector_send()`` to get the same
+bytes back. psycopg2 only binds text parameters, so query vectors keep the
+compact text form from ``vector_literal``.
+"""
+import io
+import struct
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+
+# SQL types stage_rows can encode, with their binary encoders
+_ENCODERS = {
+    "text": lambda value: str(value).encode("utf-8"),
+    "bigint": lambda value: struct.pack(">q", int(value)),
+    "double precision": lambda value: struct.pack(">d", float(value)),
+    "vector": lambda value: encode_vector(value),
+}
+
+
+def encode_vector(embedding: Sequence[float]) -> bytes:
+    """pgvector binary format: dimensions (int16), unused (int16), float32 values"""
+    values = np.asarray(embedding, dtype=">f4")
+    return struct.pack(">hh", values.shape[0], 0) + values.tobytes()
+
+
+def decode_vector(data: bytes) -> List[float]:
+    """Inverse of ``encode_vector``, e.g. for ``vector_send(embedding)`` results"""
+    dimensions = struct.unpack_from(">h", data)[0]
+    return np.frombuffer(data, dtype=">f4", count=dimensions, offset=4).astype(np.float32).tolist()
+
+
+def vector_literal(embedding: Sequence[float]) -> str:
+    """Shortest text form that round-trips float32 values, for query parameters"""
+    return "[" + ",".join(f"{value:.9g}" for value in np.asarray(embedding, dtype=np.float32)) + "]"
+
+
+def stage_rows(
+    cursor,
+    table: str,
+    columns: Sequence[Tuple[str, str]],
+    rows: Iterable[Sequence[Optional[Any]]],
+) -> int:
+    """Load ``rows`` into a new temporary ``table`` with binary COPY.
+
+    ``columns`` are ``(name, sql type)`` pairs using the types in
+    ``_ENCODERS``. The table is dropped at commit, so callers read it with
+    ``INSERT ... SELECT`` or ``UPDATE ... FROM`` in the same transaction.
+    Returns the number of rows staged.
+    """
+    encoders = [_ENCODERS[sql_type] for _, sql_type in columns]
+    buffer = io.BytesIO()
+    buffer.write(_COPY_HEADER)
+    field_count = struct.pack(">h", len(columns))
+    staged = 0
+    for row in rows:
+        buffer.write(field_count)
+        for encoder, value in zip(encoders, row):
+            if value is None:
+                buffer.write(struct.pack(">i", -1))
+            else:
+                data = encoder(value)
+                buffer.write(struct.pack(">i", len(data)))
+                buffer.write(data)
+        staged += 1
+    buffer.write(_COPY_TRAILER)
+    buffer.seek(0)
+
+    definition = ", ".join(f"{name} {sql_type}" for name, sql_type in columns)
+    cursor.execute(f"CREATE TEMP TABLE {table} ({definition}) ON COMMIT DROP")
+    cursor.copy_expert(f"COPY {table} FROM STDIN WITH (FORMAT BINARY)", buffer)
+    return staged
+
+
+def update_embeddings(cursor, table: str, rows: Iterable[Tuple[str, Sequence[float]]], extra_set: str = "") -> int:
+    """Set ``embedding`` of ``table`` rows by id (``(id, embedding)`` pairs) via binary COPY"""
+    stage_rows(cursor, "staged_embeddings", [("id", "text"), ("embedding", "vector")], rows)
+    cursor.execute(f"""
+        UPDATE {table} t
+        SET embedding = s.embedding{extra_set}
+        FROM staged_embeddings s
+        WHERE t.id = s.id::uuid
+    """)
+    return cursor.rowcount
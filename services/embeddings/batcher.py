@@ -0,0 +1,110 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent embedding requests into batched model calls.
+
+    Texts are queued by callers and flushed as one model invocation when either
+    ``max_batch_size`` texts are waiting or ``max_wait_ms`` has passed since the
+    first text of the batch arrived. At most ``max_concurrent_batches`` model
+    calls are in flight; further requests wait in the queue.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        max_concurrent_batches: int = 2,
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight = set()
+
+    async def start(self):
+        """Start the background flush loop"""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and fail any requests still queued"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher stopped"))
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed a single text, sharing a model call with concurrent requests"""
+        if self._worker is None:
+            raise RuntimeError("Embedding batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts; they are coalesced like individual requests"""
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._flush(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _flush(self, batch: List[Tuple[str, Any]]):
+        try:
+            # Identical texts inside one window only need a single model input
+            unique_texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = await self.embed_fn(unique_texts)
+                if len(embeddings) != len(unique_texts):
+                    raise RuntimeError(
+                        f"Model returned {len(embeddings)} embeddings for {len(unique_texts)} texts"
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            by_text = dict(zip(unique_texts, embeddings))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+        finally:
+            self._slots.release()
@@ -0,0 +1,134 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from common.vectors import decode_vector, stage_rows
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different uploads share a cache entry"""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache.
+
+    Entries are keyed by ``sha256(model, normalized text)``. Lookups hit a
+    bounded in-process LRU first; ``load_persistent`` falls back to the
+    ``embedding_cache`` table so entries survive restarts and are shared by all
+    replicas of the service.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_entries: int = 10000,
+        db=None,
+    ):
+        self.model = model
+        self.max_entries = max(1, max_entries)
+        self.db = db
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, text: str) -> str:
+        """Content hash for ``text`` under the configured model"""
+        payload = f"{self.model}\x00{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Return the in-process entry for ``text`` if present"""
+        key = self.key(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+            return embedding
+
+    def put(self, text: str, embedding: List[float]):
+        """Add an entry to the in-process tier, evicting the least recently used"""
+        self._put(self.key(text), embedding)
+
+    def _put(self, key: str, embedding: List[float]):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def load_persistent(self, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Fetch entries for ``texts`` from the persistent tier in one query"""
+        keys = {self.key(text): text for text in texts}
+        if not keys or self.db is None:
+            return {}
+
+        try:
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT content_hash, vector_send(embedding) FROM embedding_cache WHERE content_hash = ANY(%s)",
+                    (list(keys),)
+                )
+                rows = cursor.fetchall()
+        except Exception as e:
+            print(f"Warning: embedding cache lookup failed: {e}")
+            return {}
+
+        found = {}
+        for content_hash, embedding in rows:
+            vector = decode_vector(bytes(embedding))
+            found[keys[content_hash]] = vector
+            self._put(content_hash, vector)
+
+        with self._lock:
+            self.persistent_hits += len(found)
+        return found
+
+    def store_persistent(self, embeddings: Dict[str, List[float]]):
+        """Write freshly computed embeddings to both tiers"""
+        with self._lock:
+            self.misses += len(embeddings)
+        rows = []
+        for text, embedding in embeddings.items():
+            key = self.key(text)
+            self._put(key, embedding)
+            rows.append((key, self.model, embedding))
+
+        if not rows or self.db is None:
+            return
+
+        try:
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                stage_rows(
+                    cursor,
+                    "staged_cache_entries",
+                    [("content_hash", "text"), ("model", "text"), ("embedding", "vector")],
+                    rows
+                )
+                cursor.execute("""
+                    INSERT INTO embedding_cache (content_hash, model, embedding)
+                    SELECT content_hash, model, embedding FROM staged_cache_entries
+                    ON CONFLICT (content_hash) DO NOTHING
+                """)
+        except Exception as e:
+            print(f"Warning: embedding cache write failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.persistent_hits + self.misses
+            return {
+                "model": self.model,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.memory_hits + self.persistent_hits) / lookups if lookups else 0.0,
+            }
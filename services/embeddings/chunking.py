@@ -0,0 +1,136 @@
+"""Section-aware resume chunking.
+
+Resumes are split at recognised section headings (Experience, Education,
+Skills, ...) and long sections are packed into chunks of at most
+``CHUNK_MAX_CHARS`` along paragraph and line boundaries. Each chunk is
+embedded with its section name as context, so one vector no longer has to
+summarise a whole resume and no chunk outgrows the model context. Beyond
+``MAX_CHUNKS_PER_CANDIDATE`` chunks the rest of a resume is dropped, with a
+warning.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1200"))
+MAX_CHUNKS_PER_CANDIDATE = int(os.getenv("MAX_CHUNKS_PER_CANDIDATE", "16"))
+
+SECTION_HEADINGS = {
+    "summary", "professional summary", "profile", "objective", "about", "about me",
+    "experience", "work experience", "professional experience", "employment",
+    "employment history", "work history", "career history",
+    "education", "academic background", "qualifications",
+    "skills", "technical skills", "core competencies", "technologies",
+    "projects", "personal projects", "key projects",
+    "certifications", "certificates", "licenses",
+    "awards", "achievements", "honors",
+    "publications", "research", "volunteer", "volunteering",
+    "languages", "interests", "references",
+}
+
+_HEADING_MAX_CHARS = 40
+_CAPS_HEADING = re.compile(r"^[A-Z][A-Z &/-]{2,}$")
+
+
+@dataclass
+class Chunk:
+    section: str
+    content: str
+
+    @property
+    def embedding_text(self) -> str:
+        return f"{self.section}: {self.content}" if self.section != "general" else self.content
+
+
+def section_heading(line: str, allow_caps: bool = True):
+    """Normalised heading name if ``line`` is a section heading, else None.
+
+    Besides known section names, short ALL-CAPS lines count as headings
+    when ``allow_caps`` is set.
+    """
+    stripped = line.strip().strip("#*=-_ ").rstrip(":").strip()
+    if not stripped or len(stripped) > _HEADING_MAX_CHARS:
+        return None
+    name = " ".join(stripped.lower().split())
+    if name in SECTION_HEADINGS or (allow_caps and _CAPS_HEADING.match(stripped)):
+        return name
+    return None
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """Split ``text`` into ``(section name, body)`` pairs in document order"""
+    sections = []
+    name, lines = "general", []
+    for line in text.splitlines():
+        # A capitalised first line is usually the candidate's name
+        heading = section_heading(line, allow_caps=bool(sections or "".join(lines).strip()))
+        if heading:
+            if "".join(lines).strip():
+                sections.append((name, "\n".join(lines).strip()))
+            name, lines = heading, []
+        else:
+            lines.append(line)
+    if "".join(lines).strip():
+        sections.append((name, "\n".join(lines).strip()))
+    return sections
+
+
+def _pieces(body: str, max_chars: int) -> List[str]:
+    """Paragraphs, then lines, then word runs, each at most ``max_chars``"""
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", body):
+        for piece in ([paragraph] if len(paragraph) <= max_chars else paragraph.splitlines()):
+            piece = " ".join(piece.split())
+            while len(piece) > max_chars:
+                cut = piece.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(piece[:cut])
+                piece = piece[cut:].lstrip()
+            if piece:
+                pieces.append(piece)
+    return pieces
+
+
+def chunk_resume(
+    text: str,
+    max_chars: int = CHUNK_MAX_CHARS,
+    max_chunks: int = MAX_CHUNKS_PER_CANDIDATE,
+) -> List[Chunk]:
+    """Split a resume into at most ``max_chunks`` section-labelled chunks of at most ``max_chars``.
+
+    When there are too many, the smallest neighbouring chunks that fit in
+    ``max_chars`` together are merged, within a section where possible and
+    otherwise under the first one's section name; chunks that still do not
+    fit are dropped from the end.
+    """
+    max_chunks = max(max_chunks, 1)
+    chunks = []
+    for section, body in split_sections(text):
+        current = ""
+        for piece in _pieces(body, max_chars):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(Chunk(section, current))
+                current = piece
+            else:
+                current = f"{current}\n{piece}" if current else piece
+        if current:
+            chunks.append(Chunk(section, current))
+
+    while len(chunks) > max_chunks:
+        candidates = []
+        for i in range(len(chunks) - 1):
+            size = len(chunks[i].content) + 1 + len(chunks[i + 1].content)
+            if size <= max_chars:
+                # Prefer merging within a section
+                candidates.append((chunks[i].section != chunks[i + 1].section, size, i))
+        if not candidates:
+            break
+        _, _, index = min(candidates)
+        first, second = chunks[index], chunks[index + 1]
+        chunks[index:index + 2] = [Chunk(first.section, f"{first.content}\n{second.content}")]
+
+    if len(chunks) > max_chunks:
+        dropped = sum(len(chunk.content) for chunk in chunks[max_chunks:])
+        print(f"Warning: resume needs {len(chunks)} chunks, dropping the last {len(chunks) - max_chunks} ({dropped} chars)")
+    return chunks[:max_chunks]
@@ -0,0 +1,229 @@
+"""Embedding model backends.
+
+``EMBEDDING_PROVIDER`` selects the backend:
+
+* ``ollama`` (default): the Ollama ``/api/embed`` endpoint over a pooled
+  async HTTP client. The model is pulled in the background at startup, so
+  the service starts serving (from the cache) immediately.
+* ``sentence-transformers``: an in-process CPU model, loaded lazily on first
+  use, with ``EMBEDDING_THREADS`` intra-op threads. Set
+  ``EMBEDDING_BACKEND=onnx`` to run it on ONNX Runtime. Needs the
+  ``sentence-transformers`` package, which is not installed by default.
+* ``fake``: deterministic pseudo-random unit vectors derived from the text,
+  for tests and local development without a model.
+
+Vectors from different models are not comparable: after switching provider
+or model, re-embed stored candidates and job descriptions. Cache entries are
+keyed by ``model_id``, so they never mix.
+"""
+import asyncio
+import hashlib
+import os
+from typing import List, Optional
+
+import httpx
+import numpy as np
+
+from common.vector_search import EMBEDDING_DIMENSIONS
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "ollama")
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "nomic-embed-text")
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "8"))
+OLLAMA_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "30"))
+OLLAMA_PULL_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_PULL_TIMEOUT_SECONDS", "1800"))
+
+SENTENCE_TRANSFORMERS_MODEL = os.getenv("SENTENCE_TRANSFORMERS_MODEL", "nomic-ai/nomic-embed-text-v1.5")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+
+PROVIDERS = ("ollama", "sentence-transformers", "fake")
+
+
+class EmbeddingProvider:
+    """Turns a batch of texts into ``EMBEDDING_DIMENSIONS``-sized vectors"""
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vector space; used as the embedding cache namespace"""
+        return f"{self.name}/{self.model}"
+
+    async def start(self):
+        """Prepare the model without blocking service startup"""
+
+    async def close(self):
+        pass
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        embeddings = await self._embed(texts)
+        if len(embeddings) != len(texts):
+            raise RuntimeError(f"{self.name} returned {len(embeddings)} embeddings for {len(texts)} texts")
+        if embeddings and len(embeddings[0]) != EMBEDDING_DIMENSIONS:
+            raise RuntimeError(
+                f"{self.model_id} produces {len(embeddings[0])}-dimension embeddings, "
+                f"the database stores {EMBEDDING_DIMENSIONS}"
+            )
+        return embeddings
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def status(self) -> dict:
+        return {"provider": self.name, "model": self.model, "ready": True}
+
+
+class OllamaProvider(EmbeddingProvider):
+    name = "ollama"
+
+    def __init__(self, model: str = OLLAMA_MODEL, url: str = OLLAMA_URL):
+        super().__init__(model)
+        self.url = url
+        self.client: Optional[httpx.AsyncClient] = None
+        self._pull: Optional[asyncio.Task] = None
+        self.pull_error: Optional[str] = None
+
+    @property
+    def model_id(self) -> str:
+        # Bare model name, as used for cache entries before providers existed
+        return self.model
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.url,
+            timeout=OLLAMA_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+            ),
+        )
+        self._pull = asyncio.create_task(self.pull_model())
+
+    async def close(self):
+        if self._pull:
+            self._pull.cancel()
+            await asyncio.gather(self._pull, return_exceptions=True)
+        if self.client:
+            await self.client.aclose()
+
+    async def pull_model(self):
+        """Pull the model; a no-op for Ollama when it is already present"""
+        try:
+            response = await self.client.post(
+                "/api/pull",
+                json={"name": self.model, "stream": False},
+                timeout=OLLAMA_PULL_TIMEOUT_SECONDS,
+            )
+            if response.status_code == 200:
+                print(f"Successfully pulled {self.model} model")
+            else:
+                self.pull_error = response.text
+                print(f"Failed to pull model: {response.text}")
+        except httpx.HTTPError as e:
+            self.pull_error = str(e)
+            print(f"Error pulling model: {e}")
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        try:
+            response = await self.client.post(
+                "/api/embed",
+                json={"model": self.model, "input": texts},
+                timeout=OLLAMA_TIMEOUT_SECONDS + len(texts),
+            )
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Error connecting to Ollama: {e}") from e
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama API error: {response.text}")
+        return response.json()["embeddings"]
+
+    def status(self) -> dict:
+        return {
+            "provider": self.name,
+            "model": self.model,
+            "ready": self._pull is not None and self._pull.done() and self.pull_error is None,
+            "pull_error": self.pull_error,
+        }
+
+
+class SentenceTransformersProvider(EmbeddingProvider):
+    name = "sentence-transformers"
+
+    def __init__(
+        self,
+        model: str = SENTENCE_TRANSFORMERS_MODEL,
+        backend: str = EMBEDDING_BACKEND,
+        threads: int = EMBEDDING_THREADS,
+    ):
+        super().__init__(model)
+        self.backend = backend
+        self.threads = max(1, threads)
+        self._model = None
+        self._lock = asyncio.Lock()
+
+    def _load(self):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_PROVIDER=sentence-transformers needs the sentence-transformers package"
+            ) from e
+
+        torch.set_num_threads(self.threads)
+        kwargs = {"device": "cpu", "trust_remote_code": True}
+        if self.backend != "torch":
+            kwargs["backend"] = self.backend
+        print(f"Loading {self.model} ({self.backend}, {self.threads} threads)")
+        return SentenceTransformer(self.model, **kwargs)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        return self._model.encode(texts, batch_size=len(texts), convert_to_numpy=True).tolist()
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        # One inference at a time: the model already uses every thread it is given
+        async with self._lock:
+            if self._model is None:
+                self._model = await asyncio.to_thread(self._load)
+            return await asyncio.to_thread(self._encode, texts)
+
+    def status(self) -> dict:
+        return {
+            "provider": self.name,
+            "model": self.model,
+            "backend": self.backend,
+            "threads": self.threads,
+            "ready": self._model is not None,
+        }
+
+
+class FakeProvider(EmbeddingProvider):
+    """Same text, same unit vector; similar texts are not similar vectors"""
+
+    name = "fake"
+
+    def __init__(self, model: str = "sha256"):
+        super().__init__(model)
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+            vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSIONS)
+            embeddings.append((vector / np.linalg.norm(vector)).tolist())
+        return embeddings
+
+
+def create_provider(name: str = EMBEDDING_PROVIDER) -> EmbeddingProvider:
+    if name == "ollama":
+        return OllamaProvider()
+    if name == "sentence-transformers":
+        return SentenceTransformersProvider()
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"EMBEDDING_PROVIDER must be one of {', '.join(PROVIDERS)}")
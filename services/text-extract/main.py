@@ -1,11 +1,16 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import PyPDF2
+import asyncio
 import io
+import os
 import re
-from typing import Dict, List, Any
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional
 import spacy
 from pydantic import BaseModel
+from common.taxonomy import get_taxonomy
 
 app = FastAPI(title="Text Extraction Service", version="1.0.0")
 
@@ -18,54 +23,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load spaCy model for NER (model is installed via requirements)
-nlp = spacy.load("en_core_web_sm")
+# Extraction runs in a process pool so CPU-bound PDF parsing and NER use all
+# cores without blocking the event loop. Requests beyond EXTRACT_MAX_PENDING
+# in flight are rejected with 503.
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+EXTRACT_MAX_PENDING = int(os.getenv("EXTRACT_MAX_PENDING", str(EXTRACT_WORKERS * 4)))
+
+# spaCy model for NER, loaded once per worker process (installed via requirements)
+nlp = None
+
+def init_worker():
+    """Load the spaCy model when a pool worker starts"""
+    global nlp
+    nlp = spacy.load("en_core_web_sm")
+
+class ExtractionError(Exception):
+    """Input that cannot be extracted; reported to the client as a 400"""
 
 class ExtractionResult(BaseModel):
     text: str
     skills: List[str]
+    skill_ids: List[int] = []
     experience_years: float
     location: str
     email: str
     name: str
     structured_data: Dict[str, Any]
 
-# Skill normalization mapping
-SKILL_MAP = {
-    "python": ["python", "py"],
-    "javascript": ["javascript", "js", "ecmascript"],
-    "react": ["react", "reactjs", "react.js"],
-    "node": ["node", "nodejs", "node.js"],
-    "aws": ["aws", "amazon web services"],
-    "docker": ["docker", "dockerfile"],
-    "postgresql": ["postgresql", "postgres", "pg"],
-    "fastapi": ["fastapi", "fast api"],
-    "django": ["django"],
-    "flask": ["flask"],
-    "sql": ["sql", "mysql", "sqlite"],
-    "git": ["git", "github", "gitlab"],
-    "linux": ["linux", "unix"],
-    "kubernetes": ["kubernetes", "k8s"],
-    "redis": ["redis"],
-    "mongodb": ["mongodb", "mongo"],
-    "graphql": ["graphql", "graph ql"],
-    "machine learning": ["machine learning", "ml", "deep learning", "ai"],
-    "tensorflow": ["tensorflow", "tf"],
-    "pytorch": ["pytorch", "torch"],
-}
-
 def normalize_skills(text: str) -> List[str]:
-    """Extract and normalize skills from text"""
-    text_lower = text.lower()
-    found_skills = set()
-    
-    for skill, variations in SKILL_MAP.items():
-        for variation in variations:
-            if variation in text_lower:
-                found_skills.add(skill)
-                break
-    
-    return list(found_skills)
+    """Extract and normalize skills from text in one pass over the shared taxonomy"""
+    return get_taxonomy().find(text)
 
 def extract_experience(text: str) -> float:
     """Extract years of experience from text"""
@@ -106,6 +93,8 @@ def extract_contact_info(text: str) -> Dict[str, str]:
 
 def extract_location(text: str) -> str:
     """Extract location from text"""
+    if nlp is None:
+        init_worker()
     doc = nlp(text[:1000])  # Process first 1000 chars for speed
     
     for ent in doc.ents:
@@ -134,32 +123,21 @@ def extract_pdf_text(file_content: bytes) -> str:
             text += page.extract_text() + "\n"
         return text
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error extracting PDF text: {str(e)}")
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+        raise ExtractionError(f"Error extracting PDF text: {str(e)}")
 
-@app.post("/extract", response_model=ExtractionResult)
-async def extract_text(file: UploadFile = File(...)):
-    """Extract text and structured data from uploaded file"""
-    
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    
-    # Read file content
-    content = await file.read()
+def process_document(filename: str, content: bytes) -> Dict[str, Any]:
+    """Extract text and structured data from a file (runs in a pool worker)"""
     
     # Extract text based on file type
-    if file.filename.lower().endswith('.pdf'):
+    if filename.lower().endswith('.pdf'):
         text = extract_pdf_text(content)
-    elif file.filename.lower().endswith(('.txt', '.md')):
+    elif filename.lower().endswith(('.txt', '.md')):
         text = content.decode('utf-8')
     else:
-        raise HTTPException(status_code=400, detail="Unsupported file type. Only PDF and TXT files are supported.")
+        raise ExtractionError("Unsupported file type. Only PDF and TXT files are supported.")
     
     if not text.strip():
-        raise HTTPException(status_code=400, detail="No text found in file")
+        raise ExtractionError("No text found in file")
     
     # Extract structured information
     skills = normalize_skills(text)
@@ -174,26 +152,23 @@ async def extract_text(file: UploadFile = File(...)):
         "location": location,
         "email": contact_info["email"],
         "name": contact_info["name"],
-        "file_name": file.filename,
+        "file_name": filename,
         "text_length": len(text)
     }
     
-    return ExtractionResult(
-        text=text,
-        skills=skills,
-        experience_years=experience_years,
-        location=location,
-        email=contact_info["email"],
-        name=contact_info["name"],
-        structured_data=structured_data
-    )
+    return {
+        "text": text,
+        "skills": skills,
+        "skill_ids": get_taxonomy().to_ids(skills),
+        "experience_years": experience_years,
+        "location": location,
+        "email": contact_info["email"],
+        "name": contact_info["name"],
+        "structured_data": structured_data
+    }
 
-@app.post("/extract-job-description", response_model=ExtractionResult)
-async def extract_job_description(jd_text: str):
-    """Extract structured data from job description text"""
-    
-    if not jd_text.strip():
-        raise HTTPException(status_code=400, detail="No text provided")
+def process_job_description(jd_text: str) -> Dict[str, Any]:
+    """Extract structured data from job description text (runs in a pool worker)"""
     
     # Extract structured information
     skills = normalize_skills(jd_text)
@@ -208,15 +183,109 @@ async def extract_job_description(jd_text: str):
         "text_length": len(jd_text)
     }
     
-    return ExtractionResult(
-        text=jd_text,
-        skills=skills,
-        experience_years=experience_years,
-        location=location,
-        email="",
-        name="",
-        structured_data=structured_data
-    )
+    return {
+        "text": jd_text,
+        "skills": skills,
+        "skill_ids": get_taxonomy().to_ids(skills),
+        "experience_years": experience_years,
+        "location": location,
+        "email": "",
+        "name": "",
+        "structured_data": structured_data
+    }
+
+class ExtractionPool:
+    """Process pool with a bound on in-flight requests"""
+    
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # Bumped on every pool replacement so concurrent failures replace it once
+        self.generation = 0
+        self._replace_lock = asyncio.Lock()
+    
+    def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        self.generation += 1
+    
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+    
+    async def replace(self, generation: int):
+        """Replace the pool unless another caller already replaced ``generation``"""
+        async with self._replace_lock:
+            if self.generation != generation:
+                return
+            broken = self.executor
+            self.start()
+            # Its workers are gone; only this pool's own futures get cancelled
+            broken.shutdown(wait=False, cancel_futures=True)
+    
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Extraction workers are saturated, retry later",
+                headers={"Retry-After": "1"}
+            )
+        
+        self.pending += 1
+        try:
+            # A worker dying (e.g. out of memory on a huge PDF) breaks the whole
+            # pool and fails every request in flight on it; those requests are
+            # retried once on the replacement pool
+            for _ in range(2):
+                generation = self.generation
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+                except BrokenProcessPool:
+                    await self.replace(generation)
+            raise HTTPException(status_code=503, detail="Extraction worker crashed, retry later")
+        except ExtractionError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            self.pending -= 1
+
+extraction_pool = ExtractionPool(EXTRACT_WORKERS, EXTRACT_MAX_PENDING)
+
+@app.on_event("startup")
+async def startup_event():
+    extraction_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    extraction_pool.shutdown()
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
+
+@app.post("/extract", response_model=ExtractionResult)
+async def extract_text(file: UploadFile = File(...)):
+    """Extract text and structured data from uploaded file"""
+    
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
+    # Read file content
+    content = await file.read()
+    
+    result = await extraction_pool.run(process_document, file.filename, content)
+    return ExtractionResult(**result)
+
+@app.post("/extract-job-description", response_model=ExtractionResult)
+async def extract_job_description(jd_text: str):
+    """Extract structured data from job description text"""
+    
+    if not jd_text.strip():
+        raise HTTPException(status_code=400, detail="No text provided")
+    
+    result = await extraction_pool.run(process_job_description, jd_text)
+    return ExtractionResult(**result)
 
 if __name__ == "__main__":
     import uvicorn
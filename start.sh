@@ -33,7 +33,7 @@ sleep 15
 
 # Check service health
 echo "🔍 Checking service health..."
-services=("postgres" "ollama" "text-extract" "embeddings" "n8n" "web")
+services=("postgres" "ollama" "text-extract" "embeddings" "api" "agent" "n8n" "web")
 all_healthy=true
 
 for service in "${services[@]}"; do
@@ -53,6 +53,8 @@ if [ "$all_healthy" = true ]; then
     echo "🤖 n8n Workflows: http://localhost:5678"
     echo "📡 Text Extraction: http://localhost:8001"
     echo "🧠 Embeddings API: http://localhost:8002"
+    echo "🧩 Hiring API: http://localhost:8000"
+    echo "🤖 AI Agent: http://localhost:8003"
     echo "🗄️  Database: localhost:5432 (postgres/password)"
     echo ""
     echo "🔐 n8n Login Credentials:"